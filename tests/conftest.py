@@ -17,3 +17,23 @@ def setup_logging():
 
     init_logging(logging.WARNING)
     logger.console.quiet = True
+
+
+@pytest.fixture(scope="function")
+def git_remote(tmp_path: Path):
+    """
+    A local bare repository acting as the "origin" remote, and a clone of it with an initial commit
+    Returns the clone path
+    """
+    from track_bump.utils import exec_cmd, git_setup, set_cd
+
+    _remote_path = tmp_path / "remote.git"
+    _project_path = tmp_path / "clone"
+    exec_cmd(f"git init --bare -b {DEFAULT_BRANCH} {_remote_path}")
+    exec_cmd(f"git clone {_remote_path} {_project_path}")
+    with set_cd(_project_path):
+        with git_setup(sign_commits=False, default_branch=DEFAULT_BRANCH):
+            exec_cmd(f"git checkout -b {DEFAULT_BRANCH}")
+            exec_cmd("git commit --allow-empty -m 'init'")
+            exec_cmd(f"git push origin {DEFAULT_BRANCH}")
+            yield _project_path
@@ -135,6 +135,102 @@ def test_load_config(tmp_path, filename, config, expected):
             """,
             id="json - valid",
         ),
+        pytest.param(
+            "pyproject.toml",
+            """
+            [project]
+            version = "0.1.0"
+
+            [tool.poetry]
+            name = 'foo'
+            version  =  '0.1.0'  # comment
+            description = '''
+            version = "0.1.0"
+            '''
+
+            [tool.poetry.dependencies]
+            version = "0.1.0"
+            """,
+            {"version": "0.2.0", "tag": "tool.poetry.version"},
+            """
+            [project]
+            version = "0.1.0"
+
+            [tool.poetry]
+            name = 'foo'
+            version  =  '0.2.0'  # comment
+            description = '''
+            version = "0.1.0"
+            '''
+
+            [tool.poetry.dependencies]
+            version = "0.1.0"
+            """,
+            id="toml - dotted key path",
+        ),
+        pytest.param(
+            "package.json",
+            """
+            {
+              "name": "foo",
+              "dependencies": {"bar": {"version": "0.1.0"}},
+              "version":"0.1.0",
+              "other": {"version": "0.1.0"}
+            }
+            """,
+            {"version": "0.2.0", "tag": "version"},
+            """
+            {
+              "name": "foo",
+              "dependencies": {"bar": {"version": "0.1.0"}},
+              "version":"0.2.0",
+              "other": {"version": "0.1.0"}
+            }
+            """,
+            id="json - only root version",
+        ),
+        pytest.param(
+            "package.json",
+            """
+            {
+              "version": "0.1.0",
+              "packages": {"": {"name": "foo", "version": "0.1.0"}, "bar": {"version": "0.1.0"}}
+            }
+            """,
+            {"version": "0.2.0", "tag": "packages..version"},
+            """
+            {
+              "version": "0.1.0",
+              "packages": {"": {"name": "foo", "version": "0.2.0"}, "bar": {"version": "0.1.0"}}
+            }
+            """,
+            id="json - nested key path",
+        ),
+        pytest.param(
+            "pyproject.toml",
+            """
+            [tool.foo]
+            matrix = [
+              ["py312"],
+              { version = "0.1.0" },
+            ]
+
+            [tool.poetry]
+            version = "0.1.0"
+            """,
+            {"version": "0.2.0", "tag": "tool.poetry.version"},
+            """
+            [tool.foo]
+            matrix = [
+              ["py312"],
+              { version = "0.1.0" },
+            ]
+
+            [tool.poetry]
+            version = "0.2.0"
+            """,
+            id="toml - multi-line array",
+        ),
     ],
 )
 def test_replace_in_file(tmp_path, filename, expected, file_content, params):
@@ -146,3 +242,181 @@ def test_replace_in_file(tmp_path, filename, expected, file_content, params):
     replace_in_file(_path, **params)
 
     assert _path.read_text() == textwrap.dedent(expected)
+
+
+def test_replace_in_files_groups_tags(tmp_path, monkeypatch):
+    from track_bump import config as config_module
+    from track_bump.config import group_version_files, replace_in_files
+
+    _config_path = tmp_path / "pyproject.toml"
+    _config_path.write_text(
+        textwrap.dedent(
+            """
+            [tool.track-bump]
+            version = "0.1.0"
+            app_version = "0.1.0"
+            bump_message = "foo"
+            """
+        )
+    )
+    _files = ["pyproject.toml", "pyproject.toml:app_version", "pyproject.toml:version"]
+    assert group_version_files(_config_path, _files) == {_config_path: ("version", "app_version")}
+
+    _calls = []
+    _replace_in_file = config_module.replace_in_file
+    monkeypatch.setattr(
+        config_module, "replace_in_file", lambda *a, **kw: _calls.append(kw) or _replace_in_file(*a, **kw)
+    )
+    replace_in_files(_config_path, _files, "0.2.0")
+
+    assert len(_calls) == 1, "The file should be processed only once"
+    assert _config_path.read_text() == textwrap.dedent(
+        """
+        [tool.track-bump]
+        version = "0.2.0"
+        app_version = "0.2.0"
+        bump_message = "foo"
+        """
+    )
+
+
+@pytest.mark.parametrize("fail_fast", [False, True])
+def test_check_files(tmp_path, fail_fast):
+    from track_bump.config import VersionDrift, check_files
+
+    _config_path = tmp_path / "pyproject.toml"
+    _config_path.write_text('[tool.track-bump]\nversion = "0.2.0"\n\n[project]\nname = "foo"\nversion = "0.1.0"\n')
+    (tmp_path / "package.json").write_text('{"version": "0.2.0", "dependencies": {"version": "0.1.0"}}')
+    _files = [
+        "pyproject.toml:tool.track-bump.version",
+        "pyproject.toml:project.version",
+        "package.json",
+        "missing.json",
+    ]
+
+    _drifts = check_files(_config_path, _files, "0.2.0", fail_fast=fail_fast)
+    _expected = [
+        VersionDrift(file_path=_config_path, tag="project.version", found="0.1.0"),
+        VersionDrift(file_path=tmp_path / "missing.json", tag="version", found=None),
+    ]
+    if fail_fast:
+        assert len(_drifts) == 1 and _drifts[0] in _expected
+    else:
+        assert sorted(_drifts, key=lambda x: x.tag) == sorted(_expected, key=lambda x: x.tag)
+
+
+@pytest.mark.parametrize(
+    "filename, content, partial",
+    [
+        pytest.param(
+            "pyproject.toml",
+            """
+            [project]
+            name = "track-bump"
+            version = "0.0.1"
+            description = '''
+            [tool.track-bump]
+            '''
+
+            [tool.track-bump]
+            version = "0.1.0"
+            bump_message = "foo"
+
+            [tool.track-bump.releases]
+            "^main$" = "stable"
+
+            [project.scripts]
+            track-bump = "track_bump.__main__:run"
+
+            [tool.ruff]
+            line-length = 120
+            """,
+            True,
+            id="toml - tables",
+        ),
+        pytest.param(
+            "pyproject.toml",
+            """
+            [tool]
+            track-bump = { version = "0.1.0", bump_message = "foo" }
+            """,
+            False,
+            id="toml - inline table",
+        ),
+        pytest.param(
+            "pyproject.toml",
+            """
+            [tool]
+            track-bump.version = "0.1.0"
+            track-bump.bump_message = "foo"
+
+            [tool.track-bump.releases]
+            "^main$" = "stable"
+            """,
+            False,
+            id="toml - dotted keys",
+        ),
+        pytest.param(
+            "package.json",
+            """
+            {
+                "name": "foo",
+                "dependencies": {"version": "1.0.0", "track-bump": "^1.0.0"},
+                "version": "0.1.0",
+                "track-bump": {"bumpMessage": "foo", "tagPrefix": ""}
+            }
+            """,
+            True,
+            id="json",
+        ),
+    ],
+)
+def test_load_config_data(tmp_path, filename, content, partial):
+    import json
+
+    from track_bump.config import _extract_json_config, _extract_toml_config, load_config_data
+
+    _path = tmp_path / filename
+    _path.write_text(textwrap.dedent(content))
+    if filename.endswith(".toml"):
+        _config = tomllib.loads(_path.read_text())["tool"]["track-bump"]
+        _expected = (_config, _config.get("version"))
+    else:
+        _data = json.loads(_path.read_text())
+        _expected = (_data["track-bump"], _data["version"])
+    assert load_config_data(_path) == _expected
+    _extract = _extract_toml_config if filename.endswith(".toml") else _extract_json_config
+    assert (_extract(_path.read_text()) is not None) == partial
+
+
+def test_load_config_data_cache(tmp_path):
+    from track_bump.config import load_config_data
+
+    _path = tmp_path / ".cz.toml"
+    _path.write_text('[tool.track-bump]\nversion = "0.1.0"\nversion_files = []\n')
+    _config, version = load_config_data(_path)
+    assert version == "0.1.0"
+    _config["version_files"].append("foo")
+    assert load_config_data(_path)[0]["version_files"] == [], "The cached config should not be mutated"
+
+    _path.write_text('[tool.track-bump]\nversion = "0.10.0"\nversion_files = []\n')
+    assert load_config_data(_path)[1] == "0.10.0"
+
+
+def test_replace_in_file_key_not_found(tmp_path, caplog):
+    from track_bump.config import replace_in_file
+
+    _path = tmp_path / "pyproject.toml"
+    _path.write_text('[project]\nversion = "0.1.0"\n')
+    assert not replace_in_file(_path, "0.2.0", "tool.poetry.version")
+    assert "'tool.poetry.version' not found" in caplog.text
+
+
+def test_config_version_file(tmp_path):
+    from track_bump.config import Config, replace_in_files
+
+    _path = tmp_path / "pyproject.toml"
+    _path.write_text('[project]\nversion = "0.1.0"\n\n[tool.track-bump]\nversion = "0.1.0"\nbump_message = "foo"\n')
+    config = Config.from_file(_path)
+    replace_in_files(_path, [config.config_version_file], "0.2.0")
+    assert _path.read_text().count('version = "0.2.0"') == 2, "[project] version should be updated too"
@@ -0,0 +1,502 @@
+import multiprocessing
+from pathlib import Path
+
+import pytest
+
+from .conftest import DEFAULT_BRANCH, STATIC_DIR
+
+
+@pytest.fixture(scope="function")
+def config_path(git_remote: Path):
+    """
+    Adds the track-bump config to the clone and pushes it
+    """
+    from track_bump.utils import exec_cmd, set_cd
+
+    _config_path = git_remote / ".cz.toml"
+    _config_path.write_text((STATIC_DIR / "project" / ".cz.toml").read_text().split("version_files")[0])
+    _config_path.write_text(_config_path.read_text() + 'bump_message = "chore: release {new_version}"\n')
+    with set_cd(git_remote):
+        exec_cmd("git add . && git commit -m 'fix: add config'")
+        exec_cmd(f"git push origin {DEFAULT_BRANCH}")
+    return _config_path
+
+
+def get_remote_tags(project_path: Path):
+    from track_bump.utils import get_remote_tags, set_cd
+
+    with set_cd(project_path):
+        return set(get_remote_tags("origin"))
+
+
+def test_prune_tags(git_remote: Path):
+    from track_bump.tags import get_superseded_tags
+    from track_bump.utils import delete_remote_tags, delete_tags, exec_cmd, get_tags, set_cd
+
+    tags = ["v0.1.0", "v0.2.0-beta.0", "v0.2.0-beta.1", "v0.2.0", "v0.3.0-beta.0"]
+    with set_cd(git_remote):
+        for _tag in tags:
+            exec_cmd(f"git tag {_tag}")
+        exec_cmd("git push origin --tags")
+        exec_cmd("git tag v0.1.0-rc.0")
+
+        _superseded = get_superseded_tags(get_tags())
+        assert set(_superseded) == {"v0.2.0-beta.0", "v0.2.0-beta.1", "v0.1.0-rc.0"}
+        delete_tags(_superseded)
+        delete_remote_tags(["v0.2.0-beta.0", "v0.2.0-beta.1"], remote="origin")
+
+        assert set(get_tags()) == {"v0.1.0", "v0.2.0", "v0.3.0-beta.0"}
+    assert get_remote_tags(git_remote) == {"v0.1.0", "v0.2.0", "v0.3.0-beta.0"}
+
+
+def get_remote_branch_sha(project_path: Path, branch: str) -> str:
+    from track_bump.utils import exec_cmd, set_cd
+
+    with set_cd(project_path):
+        return exec_cmd(f"git ls-remote origin refs/heads/{branch}").split("\t")[0]
+
+
+def test_bump_push(git_remote: Path, config_path: Path):
+    from track_bump.bump import bump_project
+    from track_bump.config import Config
+    from track_bump.utils import exec_cmd, set_cd
+
+    config = Config.from_file(config_path)
+    bump_project(config, branch=DEFAULT_BRANCH, push=True)
+
+    assert get_remote_tags(git_remote) == {"v0.1.1"}
+    with set_cd(git_remote):
+        _head = exec_cmd("git rev-parse HEAD").strip()
+        assert exec_cmd("git rev-parse v0.1.1^{commit}").strip() == _head
+    assert get_remote_branch_sha(git_remote, DEFAULT_BRANCH) == _head
+
+
+def test_latest_tag_reachability(git_remote: Path):
+    from track_bump.tags import get_latest_stable_tag
+    from track_bump.utils import TagIndex, exec_cmd, resolve_branch, set_cd
+
+    with set_cd(git_remote):
+        exec_cmd("git tag v0.1.0")
+        exec_cmd("git checkout -b other && git commit --allow-empty -m 'other' && git tag v0.5.0")
+        exec_cmd("git commit --allow-empty -m 'other 2'")
+        exec_cmd("git push origin other")
+        exec_cmd(f"git checkout {DEFAULT_BRANCH} && git branch -D other")
+
+        index = TagIndex()
+        assert get_latest_stable_tag() == "v0.5.0"
+        assert get_latest_stable_tag(ref="HEAD", index=index) == "v0.1.0"
+        assert get_latest_stable_tag(ref=DEFAULT_BRANCH, index=index) == "v0.1.0"
+        assert get_latest_stable_tag(ref="origin/other~1", index=index) == "v0.5.0"
+        assert index.commits["v0.5.0"] == exec_cmd("git rev-parse origin/other~1").strip()
+
+        # A branch only known on the remote is resolved through the remote, never ignored
+        with pytest.raises(ValueError, match="Could not resolve"):
+            get_latest_stable_tag(ref="other", index=index)
+        assert get_latest_stable_tag(ref=resolve_branch("other"), index=index) == "v0.5.0"
+        with pytest.raises(ValueError, match="not found"):
+            resolve_branch("missing")
+
+
+def test_get_branches_tags(git_remote: Path, config_path: Path, monkeypatch):
+    from track_bump import utils as utils_module
+    from track_bump.bump import get_branches_tags
+    from track_bump.config import Config
+    from track_bump.utils import exec_cmd, set_cd
+
+    config = Config.from_file(config_path)
+    with set_cd(git_remote):
+        # Without any tag, there is no current tag (the base tag derived from the config does not exist)
+        assert {x.branch: x.current_tag for x in get_branches_tags(config)} == {
+            DEFAULT_BRANCH: None,
+            f"origin/{DEFAULT_BRANCH}": None,
+        }
+        exec_cmd("git tag v0.1.0")
+        exec_cmd("git checkout -b develop && git commit --allow-empty -m 'feat: foo' && git tag v0.2.0-beta.0")
+        exec_cmd("git checkout -b release/foo && git commit --allow-empty -m 'feat: bar' && git tag v0.2.0-rc.3")
+        exec_cmd("git checkout -b feature/foo")
+        exec_cmd(f"git checkout {DEFAULT_BRANCH}")
+        for i in range(20):
+            exec_cmd(f"git branch release/{i} release/foo")
+
+        _commands = []
+        monkeypatch.setattr(utils_module, "exec_cmd", lambda cmd, **kw: _commands.append(cmd) or exec_cmd(cmd, **kw))
+        _branches_tags = {x.branch: (x.release, x.current_tag, x.next_tag) for x in get_branches_tags(config)}
+    assert _branches_tags == {
+        DEFAULT_BRANCH: ("stable", "v0.1.0", "v0.1.1"),
+        f"origin/{DEFAULT_BRANCH}": ("stable", "v0.1.0", "v0.1.1"),
+        "develop": ("beta", "v0.2.0-beta.0", "v0.2.0-beta.1"),
+        "release/foo": ("rc", "v0.2.0-rc.3", "v0.2.0-rc.4"),
+        **{f"release/{i}": ("rc", "v0.2.0-rc.3", "v0.2.0-rc.4") for i in range(20)},
+    }
+    assert len(_commands) == 3, "The branches, the tags and the graph should be read once, whatever the branches"
+
+
+def test_bump_result(git_remote: Path, config_path: Path):
+    from track_bump.bump import bump_project
+    from track_bump.config import Config
+    from track_bump.utils import get_head_commit, set_cd
+
+    config = Config.from_file(config_path)
+    result = bump_project(config, branch="develop")
+    assert (result.old_version, result.new_version, result.tag, result.tagged) == (
+        "0.1.0",
+        "0.2.0-beta.0",
+        "v0.2.0-beta.0",
+        True,
+    )
+    assert result.files == [config_path]
+    with set_cd(git_remote):
+        assert result.commit == get_head_commit()
+    assert {"fetch", "tags", "files", "commit"} <= set(result.timings)
+    assert config.version == "0.2.0-beta.0", "The config should be updated in place"
+
+    result = bump_project(config, branch="develop", dry_run=True)
+    assert (result.old_version, result.new_version, result.tagged, result.commit) == (
+        "0.2.0-beta.0",
+        "0.2.0-beta.1",
+        False,
+        None,
+    )
+    assert config.version == "0.2.0-beta.0", "The config should not be updated on dry run"
+
+
+def _bump_with_reservation(project_path: Path, push: bool, queue):
+    from track_bump.bump import bump_project_with_reservation
+    from track_bump.config import Config
+    from track_bump.utils import git_setup, set_cd
+
+    with set_cd(project_path):
+        with git_setup(sign_commits=False, default_branch=DEFAULT_BRANCH):
+            config = Config.from_file(project_path / ".cz.toml")
+            result = bump_project_with_reservation(config, branch="develop", push=push, backoff=0.05, max_retries=20)
+    queue.put(result.tag)
+
+
+@pytest.mark.parametrize("push", [False, True])
+def test_bump_with_reservation_concurrently(git_remote: Path, config_path: Path, push: bool):
+    from track_bump.utils import exec_cmd, set_cd
+
+    _remote_path = git_remote.parent / "remote.git"
+    with set_cd(git_remote):
+        exec_cmd("git push origin HEAD:refs/heads/develop")
+    # Every job is cloned before any bump, so all but the first one to push are on a stale checkout
+    _project_paths = [git_remote.parent / f"job-{i}" for i in range(4)]
+    for _project_path in _project_paths:
+        exec_cmd(f"git clone --branch develop {_remote_path} {_project_path}")
+    _context = multiprocessing.get_context("fork")
+    _queue = _context.Queue()
+    _processes = [
+        _context.Process(target=_bump_with_reservation, args=(_project_path, push, _queue))
+        for _project_path in _project_paths
+    ]
+    for _process in _processes:
+        _process.start()
+    for _process in _processes:
+        _process.join(timeout=120)
+        assert _process.exitcode == 0
+
+    _tags = {_queue.get() for _ in _processes}
+    assert _tags == {f"v0.2.0-beta.{i}" for i in range(4)}, "Each job should get its own tag"
+    assert get_remote_tags(git_remote) == _tags
+    if push:
+        # Every bump commit is on the remote branch, each one tagged
+        _messages = exec_cmd(f"git --git-dir={_remote_path} log --format=%s develop").split("\n")
+        assert sum("release" in _message for _message in _messages) == 4
+        for _tag in _tags:
+            exec_cmd(f"git --git-dir={_remote_path} merge-base --is-ancestor {_tag} develop")
+
+
+def test_bump_with_reservation_failing_remote(git_remote: Path, config_path: Path):
+    from track_bump.bump import bump_project_with_reservation
+    from track_bump.config import Config
+    from track_bump.utils import exec_cmd, get_head_commit, get_tags, set_cd
+
+    config = Config.from_file(config_path)
+    with set_cd(git_remote):
+        _head = get_head_commit()
+        # The push fails after the bump commit and the tag have been created: both are rolled back
+        exec_cmd(f"git remote set-url --push origin {git_remote.parent / 'missing.git'}")
+        with pytest.raises(OSError):
+            bump_project_with_reservation(config, branch="develop", backoff=0)
+        assert get_head_commit() == _head
+        assert get_tags() == []
+        assert config.version == "0.1.0"
+
+        # The fetch fails before any commit: the uncommitted changes are kept
+        exec_cmd(f"git remote set-url origin {git_remote.parent / 'missing.git'}")
+        _text = config_path.read_text() + "# local change\n"
+        config_path.write_text(_text)
+        with pytest.raises(OSError):
+            bump_project_with_reservation(config, branch="develop", backoff=0)
+        assert get_head_commit() == _head
+        assert config_path.read_text() == _text
+
+
+def test_set_dev_version(git_remote: Path, config_path: Path):
+    from track_bump.bump import set_dev_version
+    from track_bump.config import Config
+    from track_bump.utils import exec_cmd, get_head_commit, get_tags, set_cd
+
+    config = Config.from_file(config_path)
+    with set_cd(git_remote):
+        exec_cmd("git tag v0.2.0-beta.1 HEAD~1")
+        _commit = get_head_commit()[:7]
+
+    assert set_dev_version(config) == f"0.2.0-beta.1.1+g{_commit}"
+    assert Config.from_file(config_path).version == f"0.2.0-beta.1.1+g{_commit}"
+    with set_cd(git_remote):
+        assert get_head_commit()[:7] == _commit, "No commit should be created"
+        assert get_tags() == ["v0.2.0-beta.1"], "No tag should be created"
+
+
+def test_set_dev_version_without_tag(git_remote: Path, config_path: Path):
+    from track_bump.bump import set_dev_version
+    from track_bump.config import Config
+    from track_bump.utils import get_head_commit, set_cd
+
+    with set_cd(git_remote):
+        _commit = get_head_commit()[:7]
+    _dev_version = set_dev_version(Config.from_file(config_path))
+    assert _dev_version.endswith(f"+g{_commit}")
+    assert set_dev_version(Config.from_file(config_path)) == _dev_version, "Running it again should not fail"
+
+
+def test_bump_empty_tag_prefix(git_remote: Path, config_path: Path):
+    from track_bump.bump import bump_project
+    from track_bump.config import Config
+    from track_bump.utils import exec_cmd, set_cd
+
+    config_path.write_text(config_path.read_text() + 'tag_prefix = ""\n')
+    config = Config.from_file(config_path)
+    assert config.tag_prefix == ""
+    with set_cd(git_remote):
+        exec_cmd("git tag 1.2.0 && git tag v1.5.0")
+
+    result = bump_project(config, branch=DEFAULT_BRANCH, last_commit_message="fix: foo")
+    assert (result.tag, result.new_version) == ("1.2.1", "1.2.1")
+
+
+def test_bump_tag_prefix(git_remote: Path, config_path: Path):
+    from track_bump.bump import bump_project
+    from track_bump.config import Config
+    from track_bump.tags import get_latest_stable_tag
+    from track_bump.utils import exec_cmd, get_tags, set_cd
+
+    config_path.write_text(config_path.read_text() + 'tag_prefix = "pkg-a@"\n')
+    config = Config.from_file(config_path)
+    assert config.tag_prefix == "pkg-a@"
+    with set_cd(git_remote):
+        exec_cmd("git tag v0.5.0 && git tag pkg-a@0.1.0 && git tag pkg-b@0.3.0")
+        assert get_tags("pkg-a@") == ["pkg-a@0.1.0"]
+        assert get_latest_stable_tag(ref="HEAD", prefix="pkg-b@") == "pkg-b@0.3.0"
+
+    result = bump_project(config, branch=DEFAULT_BRANCH, last_commit_message="fix: foo")
+    assert (result.tag, result.new_version) == ("pkg-a@0.1.1", "0.1.1")
+
+
+def test_bump_pack_refs(git_remote: Path, config_path: Path):
+    from track_bump.bump import bump_project
+    from track_bump.config import Config
+    from track_bump.utils import count_tag_refs, exec_cmd, set_cd
+
+    config_path.write_text(config_path.read_text() + "pack_refs_threshold = 2\n")
+    config = Config.from_file(config_path)
+    with set_cd(git_remote):
+        exec_cmd("git tag v0.1.0 && git tag v0.1.1")
+        assert count_tag_refs() == (2, 0)
+
+    bump_project(config, branch=DEFAULT_BRANCH, last_commit_message="fix: foo")
+    with set_cd(git_remote):
+        assert count_tag_refs() == (0, 3), "Tags should be packed once the threshold is crossed"
+
+
+def test_promote_tag(git_remote: Path, config_path: Path):
+    from track_bump.bump import promote_tag
+    from track_bump.config import Config
+    from track_bump.utils import exec_cmd, get_head_commit, set_cd
+
+    config = Config.from_file(config_path)
+    with set_cd(git_remote):
+        exec_cmd("git tag v0.2.0-rc.1 HEAD~1")
+        _rc_commit = exec_cmd("git rev-parse HEAD~1").strip()
+
+    with pytest.raises(ValueError, match="is not a pre-release tag"):
+        promote_tag(config, "v0.1.0")
+    with pytest.raises(ValueError, match="not found"):
+        promote_tag(config, "v0.3.0-rc.0")
+
+    result = promote_tag(config, "v0.2.0-rc.1", push=True)
+    assert (result.tag, result.commit) == ("v0.2.0", _rc_commit)
+    assert get_remote_tags(git_remote) == {"v0.2.0"}
+    with pytest.raises(ValueError, match="already exists"):
+        promote_tag(config, "v0.2.0-rc.1")
+
+    with set_cd(git_remote):
+        # The rc commit is on a release branch that has not been merged into the current branch
+        exec_cmd("git checkout -q -b release/1 && git commit -q --allow-empty -m 'fix: rc' && git tag v0.3.0-rc.0")
+        exec_cmd(f"git checkout -q {DEFAULT_BRANCH}")
+        _head = get_head_commit()
+    with pytest.raises(ValueError, match="HEAD does not contain"):
+        promote_tag(config, "v0.3.0-rc.0", update_files=True)
+    with set_cd(git_remote):
+        assert get_head_commit() == _head
+        assert exec_cmd("git tag -l v0.3.0").strip() == ""
+        exec_cmd("git merge -q --ff-only release/1")
+    result = promote_tag(config, "v0.3.0-rc.0", update_files=True)
+    assert result.files == [config_path]
+    assert Config.from_file(config_path).version == "0.3.0"
+    with set_cd(git_remote):
+        assert result.commit == get_head_commit() == exec_cmd("git rev-parse v0.3.0").strip()
+
+
+def test_discover_projects(git_remote: Path, monkeypatch):
+    from track_bump import projects as projects_module
+    from track_bump.projects import discover_projects, find_projects
+    from track_bump.utils import exec_cmd, set_cd
+
+    _config = '[tool.track-bump]\nversion = "0.1.0"\nbump_message = "chore: release {new_version}"\n'
+    for _path, _content in [
+        ("pyproject.toml", '[project]\nname = "root"\n'),
+        ("packages/a/pyproject.toml", _config),
+        ("packages/b/.cz.toml", _config.replace("0.1.0", "0.2.0")),
+        ("packages/b/pyproject.toml", _config),
+        ("packages/c/package.json", '{"version": "1.0.0", "track-bump": {"bumpMessage": "foo", "tagPrefix": "c@"}}'),
+        ("packages/d/package.json", '{"version": "1.0.0"}'),
+        ("node_modules/e/package.json", '{"version": "1.0.0", "track-bump": {"bumpMessage": "foo"}}'),
+    ]:
+        (git_remote / _path).parent.mkdir(parents=True, exist_ok=True)
+        (git_remote / _path).write_text(_content)
+    (git_remote / ".gitignore").write_text("node_modules\n")
+    with set_cd(git_remote):
+        exec_cmd("git add . && git commit -m 'add projects'")
+
+    _expected = [
+        git_remote / "packages/a/pyproject.toml",
+        git_remote / "packages/b/.cz.toml",
+        git_remote / "packages/c/package.json",
+    ]
+    assert discover_projects(git_remote / "packages") == _expected
+
+    # The manifest is used as long as the index does not change
+    monkeypatch.setattr(projects_module, "list_tracked_files", lambda *_: pytest.fail("The manifest should be used"))
+    assert discover_projects(git_remote) == _expected
+    _configs = find_projects(["packages/[bc]"], git_remote)
+    assert [(x.version, x.tag_prefix) for x in _configs] == [("0.2.0", "v"), ("1.0.0", "c@")]
+    monkeypatch.undo()
+
+    (git_remote / "packages/d/package.json").write_text('{"version": "1.0.0", "track-bump": {"bumpMessage": "foo"}}')
+    with set_cd(git_remote):
+        exec_cmd("git add packages/d")
+    assert discover_projects(git_remote) == _expected + [git_remote / "packages/d/package.json"]
+
+
+def test_bump_projects(git_remote: Path):
+    from track_bump.__main__ import cli
+    from track_bump.config import Config
+    from track_bump.utils import exec_cmd, set_cd
+
+    for _name in ("a", "b"):
+        _path = git_remote / "packages" / _name / "pyproject.toml"
+        _path.parent.mkdir(parents=True)
+        _path.write_text(
+            f'[tool.track-bump]\nversion = "0.1.0"\ntag_prefix = "{_name}@"\nbump_message = "chore: {_name}@{{new_version}}"\n'
+        )
+    with set_cd(git_remote):
+        exec_cmd("git add . && git commit -m 'add projects' && git tag a@0.1.0 && git tag b@0.1.0")
+        exec_cmd("git commit --allow-empty -m 'release: big one'")
+
+    cli.run_with_args("bump", "-p", str(git_remote), "--projects", "packages/*")
+    # Every project is bumped from the last commit before the bumps, not from the bump commit of the previous one
+    assert [Config.from_file(git_remote / "packages" / _name / "pyproject.toml").version for _name in ("a", "b")] == [
+        "0.2.0",
+        "0.2.0",
+    ]
+
+
+@pytest.mark.parametrize("process_pool", [False, True])
+def test_scan_version(git_remote: Path, monkeypatch, process_pool):
+    from track_bump import scan as scan_module
+    from track_bump.config import Config
+    from track_bump.scan import propose_version_files, scan_version
+    from track_bump.utils import exec_cmd, set_cd
+
+    (git_remote / ".cz.toml").write_text(
+        '[tool.track-bump]\nversion = "0.2.0"\nbump_message = "foo"\nversion_files = ["pyproject.toml:project.version"]\n'
+    )
+    (git_remote / "pyproject.toml").write_text(
+        '[project]\nversion = "0.2.0"\n\n[tool.foo]\nversion = "0.2.0"\nother = "10.2.0"\n'
+    )
+    (git_remote / "package.json").write_text('{\r\n  "name": "foo",\r\n  "version": "0.2.0"\r\n}\r\n')
+    (git_remote / "README.md").write_text("Version 0.2.0-beta.1\n\nInstall foo==0.2.0.\n")
+    (git_remote / "CHANGELOG.md").write_text("## 0.2.0\n")
+    (git_remote / "image.bin").write_bytes(b"\0\x010.2.0")
+    (git_remote / "empty").write_text("")
+    (git_remote / "build").mkdir()
+    (git_remote / "build" / "version.txt").write_text("0.2.0")
+    (git_remote / ".gitignore").write_text("build\n")
+    with set_cd(git_remote):
+        exec_cmd("git add . && git commit -m 'add files'")
+
+    if process_pool:
+        monkeypatch.setattr(scan_module, "_PROCESS_POOL_MIN_FILES", 0)
+    config = Config.from_file(git_remote / ".cz.toml")
+    _occurrences = scan_version(config, exclude=["CHANGELOG.md"], max_workers=2 if process_pool else 1)
+    assert sorted((x.file_path.name, x.line, x.column, x.covered) for x in _occurrences) == [
+        (".cz.toml", 2, 12, True),
+        ("README.md", 3, 14, False),
+        ("package.json", 3, 15, False),
+        ("pyproject.toml", 2, 12, True),
+        ("pyproject.toml", 5, 12, False),
+    ]
+    assert propose_version_files(config, _occurrences) == ["package.json", "pyproject.toml:tool.foo.version"]
+
+
+def test_generate_changelog(git_remote: Path, config_path: Path, monkeypatch):
+    from track_bump import changelog as changelog_module
+    from track_bump.changelog import generate_changelog
+    from track_bump.config import Config
+    from track_bump.utils import exec_cmd, set_cd
+
+    def _commit(message: str):
+        (git_remote / "file.txt").write_text(message)
+        exec_cmd(f"git add file.txt && git commit -m '{message}'")
+
+    with set_cd(git_remote):
+        exec_cmd("git tag v0.1.0")
+        _commit("feat(cli): add foo")
+        _commit("fix: fix bar")
+        _commit("chore: release v0.2.0")
+        exec_cmd("git tag v0.2.0")
+        _commit("feat!: drop baz")
+        _commit("update readme")
+        exec_cmd("git tag -a v0.3.0 -m 'v0.3.0'")
+        _commit("perf: faster qux")
+
+    config = Config.from_file(config_path)
+    _changelog = generate_changelog(config, count=None, next_tag="v0.4.0")
+    _sections = [_section.split("\n", 1)[0] for _section in _changelog.split("\n## ")]
+    assert [_section.split(" (")[0].removeprefix("## ") for _section in _sections] == [
+        "v0.4.0",
+        "v0.3.0",
+        "v0.2.0",
+        "v0.1.0",
+    ]
+    _v020 = _changelog.split("## v0.2.0")[1].split("## v0.1.0")[0]
+    assert "### Features" in _v020 and "- **cli:** add foo" in _v020 and "- fix bar" in _v020
+    assert "release" not in _v020, "The bump commits should be skipped"
+    _v030 = _changelog.split("## v0.3.0")[1].split("## v0.2.0")[0]
+    assert "### Breaking changes" in _v030 and "- drop baz" in _v030 and "### Other changes" in _v030
+    assert "- faster qux" in _changelog.split("## v0.3.0")[0]
+
+    # The sections of the tags are cached, only the new range is read from the history
+    _ranges = []
+    _iter_commits = changelog_module.iter_commits
+    monkeypatch.setattr(changelog_module, "iter_commits", lambda x: _ranges.append(x) or _iter_commits(x))
+    assert generate_changelog(config, count=None, next_tag="v0.4.0") == _changelog
+    assert _ranges == ["v0.3.0..HEAD"]
+
+    _ranges.clear()
+    with set_cd(git_remote):
+        exec_cmd("git tag v0.4.0")
+    assert generate_changelog(config, count=None).startswith("## v0.4.0")
+    assert len(_ranges) == 1
@@ -44,7 +44,7 @@ class TestTOML:
                 yield
 
     def test_bump(self, setup_project, project_path, monkeypatch):
-        monkeypatch.setattr("track_bump.utils.get_last_commit_message", lambda: None)
+        monkeypatch.setattr("track_bump.bump.get_last_commit_message", lambda: None)
         from track_bump.bump import bump_project
         from track_bump.config import Config
 
@@ -106,7 +106,7 @@ class TestJSON:
                 yield
 
     def test_bump(self, setup_project, project_path, monkeypatch):
-        monkeypatch.setattr("track_bump.utils.get_last_commit_message", lambda: None)
+        monkeypatch.setattr("track_bump.bump.get_last_commit_message", lambda: None)
         from track_bump.bump import bump_project
         from track_bump.config import Config
 
@@ -0,0 +1,84 @@
+from pathlib import Path
+
+import pytest
+
+from track_bump.config import get_default_releases
+
+from .conftest import DEFAULT_BRANCH
+
+
+def test_simulate():
+    from track_bump.simulate import SimulationEvent, simulate
+
+    events = [
+        SimulationEvent(type="bump", branch="develop"),
+        SimulationEvent(type="bump", branch="develop"),
+        SimulationEvent(type="bump", branch=DEFAULT_BRANCH, message="fix: a fix"),
+        SimulationEvent(type="merge", branch="release/1", source="develop"),
+        SimulationEvent(type="bump", branch="release/1"),
+        SimulationEvent(type="merge", branch=DEFAULT_BRANCH, source="release/1"),
+        SimulationEvent(type="bump", branch=DEFAULT_BRANCH, message="release: 1"),
+        SimulationEvent(type="merge", branch="develop", source=DEFAULT_BRANCH),
+        SimulationEvent(type="bump", branch="develop"),
+        SimulationEvent(type="merge", branch="release/2", source="develop"),
+        SimulationEvent(type="bump", branch="release/2"),
+    ]
+    result = simulate(events, releases=get_default_releases())
+
+    assert [(x.branch, x.tag) for x in result.timeline] == [
+        ("develop", "v0.2.0-beta.0"),
+        ("develop", "v0.2.0-beta.1"),
+        (DEFAULT_BRANCH, "v0.1.1"),
+        ("release/1", "v0.2.0-rc.0"),
+        (DEFAULT_BRANCH, "v0.2.0"),
+        ("develop", "v0.3.0-beta.0"),
+        ("release/2", "v0.3.0-rc.0"),
+    ]
+    assert result.conflicts == []
+    assert result.branches == {
+        "develop": "v0.3.0-beta.0",
+        DEFAULT_BRANCH: "v0.2.0",
+        "release/1": "v0.2.0-rc.0",
+        "release/2": "v0.3.0-rc.0",
+    }
+
+
+def test_simulate_conflicts():
+    from track_bump.simulate import SimulationEvent, simulate
+
+    # Two release branches created before the first one is released compute the same rc tags
+    events = [
+        SimulationEvent(type="merge", branch="release/1", source="develop"),
+        SimulationEvent(type="merge", branch="release/2", source="develop"),
+        SimulationEvent(type="bump", branch="release/1"),
+        SimulationEvent(type="bump", branch="release/2"),
+    ]
+    result = simulate(events, releases=get_default_releases(), keep_timeline=False)
+    assert result.timeline == []
+    assert [(x.event, x.tag) for x in result.conflicts] == [(3, "v0.2.0-rc.0")]
+
+
+def test_simulate_random():
+    from track_bump.simulate import generate_events, simulate
+
+    result = simulate(generate_events(10_000, default_branch=DEFAULT_BRANCH, seed=1), releases=get_default_releases())
+    assert result.events >= 10_000
+    assert len(result.timeline) == len({x.tag for x in result.timeline}) + len(result.conflicts)
+
+
+def test_load_events(tmp_path: Path):
+    from track_bump.simulate import SimulationEvent, load_events
+
+    _path = tmp_path / "events.jsonl"
+    _path.write_text(
+        '{"type": "bump", "branch": "develop", "message": "feat: foo"}\n\n'
+        '{"type": "merge", "source": "develop", "branch": "release/1"}\n'
+    )
+    assert list(load_events(_path)) == [
+        SimulationEvent(type="bump", branch="develop", message="feat: foo"),
+        SimulationEvent(type="merge", branch="release/1", source="develop"),
+    ]
+
+    _path.write_text(_path.read_text() + '{"type": "merg", "source": "develop", "branch": "main"}\n')
+    with pytest.raises(ValueError, match="Line 4: unknown event type 'merg'"):
+        list(load_events(_path))
@@ -54,6 +54,16 @@ def test_get_branch_release(branch, expected):
             nullcontext("v0.1.1"),
             id="stable patch with commit message",
         ),
+        pytest.param(
+            {
+                "stable_tag": "pkg-a/v0.1.0",
+                "release_tag": "pkg-a/v0.2.0-beta.1",
+                "release": "beta",
+                "prefix": "pkg-a/v",
+            },
+            nullcontext("pkg-a/v0.2.0-beta.2"),
+            id="beta with prefix",
+        ),
     ],
 )
 def test_get_new_tag(params, expected):
@@ -61,3 +71,92 @@ def test_get_new_tag(params, expected):
 
     with expected as e:
         assert get_new_tag(**params) == e
+
+
+@pytest.mark.parametrize(
+    "keep_last, expected",
+    [
+        pytest.param(0, ["v0.2.0-beta.1", "v0.2.0-beta.0", "v0.1.0-beta.0", "v0.2.0-rc.0"], id="all"),
+        pytest.param(1, ["v0.2.0-beta.0", "v0.1.0-beta.0"], id="keep last"),
+    ],
+)
+def test_get_superseded_tags(keep_last, expected):
+    from track_bump.tags import get_superseded_tags
+
+    tags = [
+        "v0.1.0",
+        "v0.2.0",
+        "v0.1.0-beta.0",
+        "v0.2.0-beta.0",
+        "v0.2.0-beta.1",
+        "v0.2.0-rc.0",
+        "v0.3.0-beta.0",
+        "foo",
+    ]
+    assert get_superseded_tags(tags, keep_last=keep_last) == expected
+
+
+@pytest.mark.parametrize(
+    "tag, style, expected",
+    [
+        pytest.param("v0.1.0", "semver", "0.1.1-dev.5+g1a2b3c4", id="semver stable"),
+        pytest.param("v0.2.0-beta.1", "semver", "0.2.0-beta.1.5+g1a2b3c4", id="semver beta"),
+        pytest.param("v0.1.0", "pep440", "0.1.1.dev5", id="pep440 stable"),
+        pytest.param("v0.2.0-rc.2", "pep440", "0.2.0rc3.dev5", id="pep440 rc"),
+        pytest.param("v0.2.0-beta.0", "pep440", "0.2.0b1.dev5", id="pep440 beta"),
+    ],
+)
+def test_get_dev_version(tag, style, expected):
+    from track_bump.tags import get_dev_version, get_dev_version_base
+
+    assert get_dev_version(tag, distance=5, commit="1a2b3c4", style=style) == expected
+    assert get_dev_version_base(expected) == tag.removeprefix("v")
+
+
+def test_get_dev_version_pep440_order():
+    from track_bump.tags import get_dev_version
+
+    Version = pytest.importorskip("packaging.version").Version
+    _dev_version = Version(get_dev_version("v0.2.0-rc.2", distance=5, commit="1a2b3c4", style="pep440"))
+    assert Version("0.2.0rc2") < _dev_version < Version("0.2.0rc3")
+    with pytest.raises(ValueError, match="PEP 440"):
+        get_dev_version("v0.2.0-foo.2", distance=5, commit="1a2b3c4", style="pep440")
+
+
+def test_count_tags_per_release():
+    from track_bump.tags import count_tags_per_release
+
+    tags = ["v0.1.0", "v0.2.0", "v0.2.0-beta.0", "v0.2.0-beta.1", "v0.2.0-rc.0", "foo"]
+    assert count_tags_per_release(tags) == {"stable": 2, "beta": 2, "rc": 1, "other": 1}
+
+
+@pytest.mark.parametrize(
+    "release, expected",
+    [
+        pytest.param("stable", [("v0.2.0", "v0.10.0"), ("v0.1.0", "v0.2.0"), (None, "v0.1.0")], id="stable"),
+        pytest.param(
+            "rc",
+            [("v0.2.0", "v0.10.0-rc.0"), ("v0.2.0-rc.0", "v0.2.0-rc.1"), ("v0.1.0", "v0.2.0-rc.0")],
+            id="rc",
+        ),
+    ],
+)
+def test_get_tag_ranges(release, expected):
+    from track_bump.tags import get_tag_ranges
+
+    tags = ["v0.10.0", "v0.10.0-rc.0", "v0.2.0", "v0.2.0-rc.1", "v0.2.0-rc.0", "v0.2.0-beta.0", "v0.1.0", "foo"]
+    assert get_tag_ranges(tags, release=release) == expected
+
+
+@pytest.mark.parametrize(
+    "version, prefix, expected",
+    [
+        pytest.param("0.1.0", "v", "v0.1.0", id="0.1.0"),
+        pytest.param("0.3.2", "v", "v0.2.2", id="0.3.2"),
+        pytest.param("1.0.0", "pkg-a@", "pkg-a@1.1.0", id="prefix"),
+    ],
+)
+def test_get_base_stable_tag(version, prefix, expected):
+    from track_bump.tags import get_base_stable_tag
+
+    assert get_base_stable_tag(version, prefix=prefix) == expected
@@ -7,9 +7,21 @@ import pytest
         pytest.param("0.1.0", ((0, 1, 0), None), id="0.1.0"),
         pytest.param("v0.1.0", ((0, 1, 0), None), id="v0.1.0"),
         pytest.param("0.1.0-beta.1", ((0, 1, 0), ("beta", 1)), id="0.1.0-beta.1"),
+        pytest.param("0.1.1-dev.5+g1a2b3c4", ((0, 1, 0), None), id="semver dev version"),
+        pytest.param("0.2.0-beta.1.5+g1a2b3c4", ((0, 2, 0), ("beta", 1)), id="semver pre-release dev version"),
+        pytest.param("0.1.1.dev5", ((0, 1, 0), None), id="pep440 dev version"),
+        pytest.param("0.2.0rc3.dev5", ((0, 2, 0), ("rc", 2)), id="pep440 pre-release dev version"),
     ],
 )
 def test_parse_version(version, expected):
     from track_bump.utils import parse_version
 
     assert parse_version(version) == expected
+
+
+@pytest.mark.parametrize("version", ["foo", "v1.2.3garbage", "v1.2.3-beta", "1.2.3.4", "1.2.3-beta.1+foo"])
+def test_parse_invalid_version(version):
+    from track_bump.utils import parse_version
+
+    with pytest.raises(ValueError, match="Invalid version"):
+        parse_version(version)
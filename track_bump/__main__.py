@@ -1,14 +1,50 @@
+import dataclasses
+import json
 import logging
+import os
+import time
 from pathlib import Path
+from typing import Literal
 
 from piou import Cli, Option
 
-from .bump import bump_project
-from .config import Config
+from . import env
+from .bump import (
+    bump_project,
+    bump_project_with_reservation,
+    get_branches_tags,
+    get_next_tag,
+    promote_tag,
+    set_dev_version,
+)
+from .changelog import generate_changelog
+from .config import Config, check_files, get_default_releases
+from .logs import DRY_RUN_END, DRY_RUN_START, TAG_END, TAG_START, logger
 from .logs import init_logging as _init_logging
-from .logs import logger
-from .tags import get_branch_release, get_latest_release_tag, get_latest_stable_tag
-from .utils import get_current_branch, set_cd
+from .projects import find_projects
+from .scan import propose_version_files, scan_version
+from .simulate import generate_events, load_events, simulate
+from .tags import (
+    DEFAULT_TAG_PREFIX,
+    count_tags_per_release,
+    get_branch_release,
+    get_latest_release_tag,
+    get_latest_stable_tag,
+    get_superseded_tags,
+)
+from .utils import (
+    count_tag_refs,
+    delete_remote_tags,
+    delete_tags,
+    fetch_tags,
+    get_current_branch,
+    get_last_commit_message,
+    get_ref_storage,
+    get_remote_tags,
+    get_tags,
+    resolve_branch,
+    set_cd,
+)
 
 cli = Cli("Track-bump utility commands")
 
@@ -26,6 +62,26 @@ def on_process(verbose: bool = False, verbose2: bool = False, init_logging: bool
 
 cli.set_options_processor(on_process)
 
+_PROJECTS_HELP = (
+    "Comma-separated glob patterns of the project directories (relative to the repository root), '*' for all"
+)
+
+
+def _get_configs(project_path: Path, projects: str | None) -> list[Config]:
+    """
+    Return the config of the project, or the configs of the projects of the repository matching the patterns
+    """
+    if projects is None:
+        return [Config.from_project(project_path)]
+    configs = find_projects([_pattern.strip() for _pattern in projects.split(",")], path=project_path)
+    if not configs:
+        raise ValueError(f"No project matching {projects!r}")
+    return configs
+
+
+def _get_project_name(config: Config, project_path: Path) -> str:
+    return os.path.relpath(config.project_path, project_path)
+
 
 @cli.command(cmd="bump", help="Bump project version")
 def bump(
@@ -37,6 +93,11 @@ def bump(
     no_reset_git: bool = Option(False, "--no-reset-git", help="Do not reset git config"),
     no_tag: bool = Option(False, "--no-tag", help="Do not create a tag"),
     pre_release: str | None = Option(None, "--pre-release", help="Pre-release version"),
+    push: bool = Option(False, "--push", help="Push the commit and the tag atomically"),
+    remote: str = Option("origin", "--remote", help="Remote to push to"),
+    reserve: bool = Option(False, "--reserve", help="Reserve the tag on the remote, retrying on conflicts"),
+    max_retries: int = Option(5, "--max-retries", help="Maximum number of retries when reserving the tag"),
+    projects: str | None = Option(None, "--projects", help=_PROJECTS_HELP),
 ):
     """
     Bump the version of the project:
@@ -45,22 +106,52 @@ def bump(
        - Creates the tag
        - Update the version files
     - Commit the changes and tag
+    - Push the commit and the tag in a single atomic push (--push)
+
+    With --reserve, the tag is pushed with a compare-and-swap: if another job has already
+    pushed the same tag, the bump is rolled back and recomputed, so jobs can bump concurrently.
+
+    With --projects, every project of the repository matching the patterns is bumped, one after the other.
 
     The branches are mapped to the release tags as follows:
     - develop: beta
     - release: rc
     """
-    config = Config.from_project(project_path)
-    bump_project(
-        config,
-        sign_commits,
-        branch=branch,
-        dry_run=dry_run,
-        force=force,
-        no_reset_git=no_reset_git,
-        add_tag=not no_tag,
-        pre_release=pre_release,
-    )
+    if reserve and (dry_run or no_tag):
+        raise ValueError("--reserve cannot be used with --dry-run or --no-tag")
+    configs = _get_configs(project_path, projects)
+    # Read before any bump: the bump commit of a project is the last commit when bumping the next one
+    with set_cd(project_path):
+        _last_commit_message = get_last_commit_message()
+    for config in configs:
+        if reserve:
+            bump_project_with_reservation(
+                config,
+                sign_commits,
+                branch=branch,
+                last_commit_message=_last_commit_message,
+                no_reset_git=no_reset_git,
+                pre_release=pre_release,
+                push=push,
+                remote=remote,
+                max_retries=max_retries,
+            )
+            continue
+        result = bump_project(
+            config,
+            sign_commits,
+            branch=branch,
+            last_commit_message=_last_commit_message,
+            dry_run=dry_run,
+            force=force,
+            no_reset_git=no_reset_git,
+            add_tag=not no_tag,
+            pre_release=pre_release,
+            push=push,
+            remote=remote,
+        )
+        if no_tag:
+            print(result.tag)
 
 
 @cli.command(cmd="get-latest-tag", help="Get the latest tag")
@@ -68,19 +159,340 @@ def get_latest_tag(
     project_path: Path = Option(Path.cwd(), "-p", "--project", help="Project path"),
     branch: str | None = Option(None, "--branch", help="Branch to bump"),
     pre_release: str | None = Option(None, "--pre-release", help="Pre-release version"),
+    remote: str = Option("origin", "--remote", help="Remote to read the branch from if it does not exist locally"),
+    projects: str | None = Option(None, "--projects", help=_PROJECTS_HELP),
 ):
     f"""
     Prints the latest tag for the given branch (default: current branch)
     otherwise, it will return the latest associated release tag
+    With --projects, prints <project>: <tag> for every project matching the patterns.
+    """
+    for config in _get_configs(project_path, projects):
+        with set_cd(config.project_path):
+            _branch = branch or get_current_branch()
+            logger.info(f"Getting latest tag for branch {_branch}")
+            _release = pre_release or get_branch_release(_branch, releases=config.releases)
+            _ref = resolve_branch(branch, remote=remote) if branch else "HEAD"
+            _prefix = config.tag_prefix
+            tag = (
+                get_latest_stable_tag(ref=_ref, prefix=_prefix)
+                if _branch == config.default_branch
+                else get_latest_release_tag(_release, ref=_ref, prefix=_prefix)
+            )
+        if projects is not None:
+            print(f"{_get_project_name(config, project_path)}: {tag or '-'}")
+        elif tag:
+            print(tag)
+
+
+@cli.command(cmd="promote", help="Promote a pre-release tag to stable")
+def promote(
+    tag: str = Option(..., help="Pre-release tag to promote, for instance v0.2.0-rc.1"),
+    project_path: Path = Option(Path.cwd(), "-p", "--project", help="Project path"),
+    update_files: bool = Option(False, "--update-files", help="Commit the stable version in the version files"),
+    sign_commits: bool = Option(False, "--sign", help="Sign commits"),
+    no_reset_git: bool = Option(False, "--no-reset-git", help="Do not reset git config"),
+    push: bool = Option(False, "--push", help="Push the tag (and the commit) atomically"),
+    remote: str = Option("origin", "--remote", help="Remote to push to"),
+    dry_run: bool = Option(False, "--dry-run", help="Dry run"),
+):
+    """
+    Creates the stable tag of an approved pre-release tag on the same commit:
+    v0.2.0-rc.1 -> v0.2.0, so the artifacts built for the pre-release can be reused as is.
+    With --update-files, the version files are updated in a new commit which is tagged instead
+    (the current branch must contain the pre-release commit).
+    """
+    config = Config.from_project(project_path)
+    result = promote_tag(
+        config,
+        tag,
+        update_files=update_files,
+        sign_commits=sign_commits,
+        no_reset_git=no_reset_git,
+        push=push,
+        remote=remote,
+        dry_run=dry_run,
+    )
+    print(result.tag)
+
+
+@cli.command(cmd="dev-version", help="Set a development version without committing nor tagging")
+def dev_version(
+    project_path: Path = Option(Path.cwd(), "-p", "--project", help="Project path"),
+    style: Literal["semver", "pep440"] = Option("semver", "--style", help="Version style"),
+    dry_run: bool = Option(False, "--dry-run", help="Dry run"),
+):
+    """
+    Computes a unique development version from the closest tag and the number of commits since it
+    (for instance 0.2.0-beta.1.5+g1a2b3c4 or 0.2.0.dev5), writes it to the version files and prints it.
+    No commit nor tag is created, which makes it suitable for per-commit builds.
+    """
+    config = Config.from_project(project_path)
+    print(set_dev_version(config, style=style, dry_run=dry_run))
+
+
+@cli.command(cmd="get-branches-tags", help="Get the current and next tags of every branch")
+def get_all_branches_tags(
+    project_path: Path = Option(Path.cwd(), "-p", "--project", help="Project path"),
+    output_format: Literal["table", "json"] = Option("table", "--format", help="Output format"),
+):
+    """
+    Prints the current and next tags of every local and remote branch matching the releases.
+    The branches and tags are read once, instead of running get-latest-tag for each branch.
+    """
+    config = Config.from_project(project_path)
+    with set_cd(project_path):
+        _branches_tags = get_branches_tags(config)
+    if output_format == "json":
+        print(json.dumps([dataclasses.asdict(x) for x in _branches_tags], indent=2))
+        return
+    _rows = [("BRANCH", "RELEASE", "CURRENT", "NEXT")] + [
+        (x.branch, x.release, x.current_tag or "-", x.next_tag) for x in _branches_tags
+    ]
+    _widths = [max(len(_row[i]) for _row in _rows) for i in range(4)]
+    for _row in _rows:
+        print("  ".join(_value.ljust(_width) for _value, _width in zip(_row, _widths)).rstrip())
+
+
+@cli.command(cmd="check", help="Check that the version files match the config version")
+def check(
+    project_path: Path = Option(Path.cwd(), "-p", "--project", help="Project path"),
+    fail_fast: bool = Option(False, "--fail-fast", help="Stop at the first file with a different version"),
+    projects: str | None = Option(None, "--projects", help=_PROJECTS_HELP),
+):
+    """
+    Checks that every entry of version_files (and the config file itself) contains the config version.
+    Each drift is printed as <file>:<key>: <found version>
+    With --projects, every project matching the patterns is checked and the files are relative to --project.
+    Exits with 1 if any drift is found, 0 otherwise.
+    """
+    _has_drifts = False
+    for config in _get_configs(project_path, projects):
+        _drifts = check_files(
+            config.config_path,
+            config.version_files + [config.config_version_file],
+            config.version,
+            fail_fast=fail_fast,
+        )
+        _base_path = config.project_path if projects is None else project_path
+        for _drift in _drifts:
+            _found = _drift.found if _drift.found is not None else "not found"
+            _file = os.path.relpath(_drift.file_path, _base_path)
+            print(f"{_file}:{_drift.tag}: {_found} (expected {config.version})")
+        if _drifts:
+            _has_drifts = True
+            if fail_fast:
+                break
+        else:
+            logger.info(f"All version files of {_get_project_name(config, project_path)} match {config.version}")
+    if _has_drifts:
+        raise SystemExit(1)
+
+
+@cli.command(cmd="scan", help="Find the occurrences of the version not updated by version_files")
+def scan(
+    project_path: Path = Option(Path.cwd(), "-p", "--project", help="Project path"),
+    exclude: str | None = Option(None, "--exclude", help="Comma-separated glob patterns of the files to skip"),
+    propose: bool = Option(False, "--propose", help="Print the version_files entries to add"),
+    show_all: bool = Option(False, "--all", help="Also print the occurrences updated by version_files"),
+):
+    """
+    Searches the config version in every file tracked by git (binary files are skipped)
+    and prints the occurrences not updated by version_files as <file>:<line>:<column>: <line text>
+    With --propose, prints the version_files entries covering them (TOML and JSON values only).
+    Exits with 1 if any occurrence is not covered, 0 otherwise.
+    """
+    config = Config.from_project(project_path)
+    _exclude = [_pattern.strip() for _pattern in exclude.split(",")] if exclude else None
+    _start = time.perf_counter()
+    _occurrences = scan_version(config, exclude=_exclude)
+    logger.info(f"Found {len(_occurrences)} occurrences of {config.version} in {time.perf_counter() - _start:.2f}s")
+
+    _uncovered = [_occurrence for _occurrence in _occurrences if not _occurrence.covered]
+    for _occurrence in _occurrences if show_all else _uncovered:
+        _file = _occurrence.file_path.relative_to(config.project_path)
+        _covered = " (covered)" if _occurrence.covered else ""
+        print(f"{_file}:{_occurrence.line}:{_occurrence.column}: {_occurrence.text}{_covered}")
+    if propose and (_entries := propose_version_files(config, _occurrences)):
+        print("Proposed version_files entries:")
+        for _entry in _entries:
+            print(f"  {json.dumps(_entry)}")
+    if _uncovered:
+        raise SystemExit(1)
+
+
+@cli.command(cmd="changelog", help="Generate the changelog of the releases")
+def changelog(
+    project_path: Path = Option(Path.cwd(), "-p", "--project", help="Project path"),
+    tag: str | None = Option(None, "--tag", help="Tag to generate the section of (default: the latest tag)"),
+    count: int = Option(1, "--count", help="Number of sections to generate, from the latest tag"),
+    all_tags: bool = Option(False, "--all", help="Generate the sections of every tag"),
+    release: str = Option("stable", "--release", help="Release of the tags (stable, beta, rc...)"),
+    unreleased: bool = Option(False, "--unreleased", help="Add the commits since the latest tag, as the next tag"),
+    output: Path | None = Option(None, "-o", "--output", help="File to write the changelog to"),
+    no_cache: bool = Option(False, "--no-cache", help="Do not use nor update the cached sections"),
+):
+    """
+    Generates the markdown changelog of the releases: each section lists the commits between the previous tag
+    and the tag, grouped by conventional commit type (feat, fix, perf...). The bump commits are skipped.
+    The sections are cached in the git directory, so only the new tags are read from the history.
+    With --unreleased, the commits since the latest tag are added first, titled with the tag the next bump
+    of the current branch would create.
+    """
+    config = Config.from_project(project_path)
+    _next_tag = None
+    if unreleased:
+        with set_cd(config.project_path):
+            _release = get_branch_release(get_current_branch(), releases=config.releases)
+            _next_tag = get_next_tag(config, _release, last_commit_message=get_last_commit_message()).new_tag
+    _changelog = generate_changelog(
+        config,
+        tag=tag,
+        count=None if all_tags else count,
+        release=release,
+        next_tag=_next_tag,
+        use_cache=not no_cache,
+    )
+    if output is None:
+        print(_changelog)
+    else:
+        output.write_text(_changelog)
+
+
+@cli.command(cmd="projects", help="List the projects of the repository")
+def list_projects(
+    project_path: Path = Option(Path.cwd(), "-p", "--project", help="Path inside the repository"),
+    patterns: str = Option("*", "--projects", help=_PROJECTS_HELP),
+    output_format: Literal["table", "json"] = Option("table", "--format", help="Output format"),
+):
+    """
+    Lists the projects of the repository (directories with a track-bump config among the tracked files)
+    matching the patterns, with their version and tag prefix.
+    The list is cached in the git directory until the git index changes.
+    """
+    _projects = [
+        {"project": _get_project_name(config, project_path), "version": config.version, "tag_prefix": config.tag_prefix}
+        for config in _get_configs(project_path, patterns)
+    ]
+    if output_format == "json":
+        print(json.dumps(_projects, indent=2))
+        return
+    for _project in _projects:
+        print(f"{_project['project']}  {_project['version']}  {_project['tag_prefix']}")
+
+
+@cli.command(cmd="simulate", help="Simulate the versioning rules on a history, without git")
+def simulate_history(
+    project_path: Path = Option(Path.cwd(), "-p", "--project", help="Project path"),
+    events_path: Path | None = Option(None, "--events", help="JSON lines file of events to replay"),
+    random_events: int = Option(0, "--random", help="Number of random events to generate"),
+    seed: int | None = Option(None, "--seed", help="Seed of the random events"),
+    timeline: bool = Option(False, "--timeline", help="Print every computed tag"),
+    output_format: Literal["table", "json"] = Option("table", "--format", help="Output format"),
+):
+    """
+    Replays a history of bumps and merges in memory through the same rules as `bump`,
+    using the releases and tag prefix of the project config (or the default releases if there is no config).
+    Events are read from a JSON lines file (--events), for instance:
+        {"type": "bump", "branch": "develop", "message": "feat: foo"}
+        {"type": "merge", "source": "develop", "branch": "release/1"}
+    or randomly generated (--random). Prints the latest tag of each branch and the tags computed twice.
+    """
+    try:
+        config = Config.from_project(project_path)
+        releases, version, prefix = config.releases, config.version, config.tag_prefix
+    except FileNotFoundError:
+        releases, version, prefix = get_default_releases(), "0.1.0", DEFAULT_TAG_PREFIX
+    if events_path is not None:
+        _events = load_events(events_path)
+    elif random_events:
+        _events = generate_events(random_events, default_branch=env.DEFAULT_BRANCH, seed=seed)
+    else:
+        raise ValueError("Either --events or --random must be specified")
+
+    _start = time.perf_counter()
+    result = simulate(_events, releases=releases, version=version, prefix=prefix, keep_timeline=timeline)
+    _duration = time.perf_counter() - _start
+    logger.info(f"Simulated {result.events} events in {_duration:.2f}s")
+
+    if output_format == "json":
+        print(json.dumps(dataclasses.asdict(result), indent=2))
+        return
+    for _entry in result.timeline:
+        print(f"{_entry.event}  {_entry.branch}  {_entry.tag}")
+    print(f"Events: {result.events}")
+    for _branch, _tag in result.branches.items():
+        print(f"  {_branch}: {_tag or '-'}")
+    print(f"Conflicts: {len(result.conflicts)}")
+    for _entry in result.conflicts:
+        print(f"  {_entry.event}  {_entry.branch}  {_entry.tag}")
+
+
+_LOOSE_REFS_WARNING_THRESHOLD = 1000
+
+
+@cli.command(cmd="doctor", help="Report the health of the tag refs storage")
+def doctor(
+    project_path: Path = Option(Path.cwd(), "-p", "--project", help="Project path"),
+):
+    """
+    Reports the number of tags per release, the number of loose and packed tag refs
+    and the duration of a tag scan.
+    Many loose refs (one file per tag) slow down every git command reading the tags:
+    run `git pack-refs` or set pack_refs_threshold in the config to pack them after each bump.
+    """
+    config = Config.from_project(project_path)
+    with set_cd(project_path):
+        _start = time.perf_counter()
+        _tags = get_tags(config.tag_prefix)
+        _scan_duration = time.perf_counter() - _start
+        _ref_storage = get_ref_storage()
+        _loose, _packed = count_tag_refs()
+
+    print(f"Ref storage: {_ref_storage}")
+    print(f"Tags ({config.tag_prefix}*): {len(_tags)}")
+    for _release, _count in sorted(count_tags_per_release(_tags, prefix=config.tag_prefix).items()):
+        print(f"  {_release}: {_count}")
+    if _ref_storage == "files":
+        print(f"Tag refs (all prefixes): {_loose} loose, {_packed} packed")
+    print(f"Tag scan: {_scan_duration * 1000:.1f}ms")
+    if _ref_storage == "files" and _loose > _LOOSE_REFS_WARNING_THRESHOLD:
+        logger.warning(
+            f"{_loose} loose tag refs: run `git pack-refs` or set pack_refs_threshold in the config "
+            "to pack them after each bump"
+        )
+
+
+@cli.command(cmd="prune-tags", help="Delete the pre-release tags superseded by a stable tag")
+def prune_tags(
+    project_path: Path = Option(Path.cwd(), "-p", "--project", help="Project path"),
+    keep_last: int = Option(0, "--keep-last", help="Number of superseded tags to keep per release"),
+    remote: str = Option("origin", "--remote", help="Remote to delete the tags from"),
+    local: bool = Option(False, "--local", help="Only delete the local tags"),
+    dry_run: bool = Option(False, "--dry-run", help="Dry run"),
+    force: bool = Option(False, "--force", help="Force fetch tags"),
+):
+    """
+    Delete the pre-release tags (beta, rc, ...) whose version has already been released as a stable tag.
+    The tags are deleted locally and on the remote (unless --local is specified) in batches.
+    For example, with v0.2.0 released, v0.2.0-beta.0, v0.2.0-beta.1 and v0.2.0-rc.0 are deleted.
     """
     config = Config.from_project(project_path)
+    _prefix = config.tag_prefix
     with set_cd(project_path):
-        _branch = branch or get_current_branch()
-        logger.info(f"Getting latest tag for branch {_branch}")
-        _release = pre_release or get_branch_release(_branch, releases=config.releases)
-        tag = get_latest_stable_tag() if _branch == config.default_branch else get_latest_release_tag(_release)
-    if tag:
-        print(tag)
+        if not local:
+            fetch_tags(force=force)
+        _tags = get_superseded_tags(get_tags(_prefix), keep_last=keep_last, prefix=_prefix)
+        _remote_tags = [] if local else sorted(set(_tags) & set(get_remote_tags(remote, prefix=_prefix)))
+        if dry_run:
+            logger.info(f"{DRY_RUN_START}Would delete {len(_tags)} tags ({len(_remote_tags)} on {remote}){DRY_RUN_END}")
+            for _tag in _tags:
+                print(_tag)
+            return
+        logger.info(f"Deleting {TAG_START}{len(_tags)}{TAG_END} tags ({len(_remote_tags)} on {remote})")
+        delete_tags(_tags)
+        if _remote_tags:
+            delete_remote_tags(_remote_tags, remote=remote)
 
 
 def run():
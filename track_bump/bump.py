@@ -1,16 +1,44 @@
+import contextlib
+import random
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Literal
 
-from track_bump.config import Config, replace_in_files
-from track_bump.tags import get_branch_release, get_latest_release_tag, get_latest_stable_tag, get_new_tag
+from track_bump.config import Config, group_version_files, replace_in_files
+from track_bump.tags import (
+    get_base_stable_tag,
+    get_branch_release,
+    get_dev_version,
+    get_dev_version_base,
+    get_latest_release_tag,
+    get_latest_stable_tag,
+    get_new_tag,
+)
 from track_bump.utils import (
+    TagIndex,
+    delete_tags,
     fetch_tags,
+    get_branches,
+    get_commit_count,
     get_current_branch,
+    get_head_commit,
     get_last_commit_message,
     git_commit,
+    git_describe,
+    git_pull_rebase,
+    git_push,
+    git_reset,
+    git_restore,
     git_setup,
     git_tag,
+    is_ancestor,
+    list_tracked_files,
+    pack_refs,
     parse_version,
+    reserve_tag,
     set_cd,
+    tag_exists,
 )
 
 from .logs import (
@@ -24,6 +52,113 @@ from .logs import (
 )
 
 
+@dataclass
+class NextTag:
+    # Latest stable tag, or the base tag derived from the version of the config if there is none yet
+    stable_tag: str
+    release_tag: str | None
+    new_tag: str
+    # Latest stable tag actually found (None if there is none yet)
+    latest_stable_tag: str | None = None
+
+
+def get_next_tag(
+    config: Config,
+    release: str,
+    ref: str | None = "HEAD",
+    index: TagIndex | None = None,
+    last_commit_message: str | None = None,
+) -> NextTag:
+    """
+    Compute the new tag of the given release from the latest stable and release tags reachable from ref.
+    If there is no stable tag yet, the stable tag is derived from the version of the config.
+    """
+    _prefix = config.tag_prefix
+    _latest_stable_tag = get_latest_stable_tag(ref=ref, index=index, prefix=_prefix)
+    # If no latest tag, use the current version
+    _stable_tag = _latest_stable_tag or get_base_stable_tag(config.version, prefix=_prefix)
+
+    _latest_release_tag = get_latest_release_tag(release, ref=ref, index=index, prefix=_prefix)
+    _new_tag = get_new_tag(
+        stable_tag=_stable_tag,
+        release_tag=_latest_release_tag,
+        last_commit_message=last_commit_message,
+        release=release,
+        prefix=_prefix,
+    )
+    return NextTag(
+        stable_tag=_stable_tag,
+        release_tag=_latest_release_tag,
+        new_tag=_new_tag,
+        latest_stable_tag=_latest_stable_tag,
+    )
+
+
+@dataclass
+class BranchTags:
+    branch: str
+    commit: str
+    release: str
+    current_tag: str | None
+    next_tag: str
+
+
+def get_branches_tags(config: Config) -> list[BranchTags]:
+    """
+    Compute the current and next tags of every local and remote branch supported by the releases.
+    The branches are listed with a single `git for-each-ref` and the tags and the commit graph are read once
+    (see `TagIndex`): the number of git commands does not depend on the number of branches.
+    """
+    _index = TagIndex(prefix=config.tag_prefix)
+    _branches_tags = []
+    for _branch in get_branches():
+        try:
+            _release = get_branch_release(_branch.name, releases=config.releases)
+        except ValueError:
+            logger.debug(f"Skipping unsupported branch {_branch.ref}")
+            continue
+        _next_tag = get_next_tag(
+            config,
+            release=_release,
+            ref=_branch.commit,
+            index=_index,
+            last_commit_message=_branch.subject or None,
+        )
+        _branches_tags.append(
+            BranchTags(
+                branch=_branch.ref,
+                commit=_branch.commit,
+                release=_release,
+                # None (not the base tag derived from the config) if the branch has no tag yet
+                current_tag=_next_tag.latest_stable_tag if _release == "stable" else _next_tag.release_tag,
+                next_tag=_next_tag.new_tag,
+            )
+        )
+    return _branches_tags
+
+
+@dataclass
+class BumpResult:
+    old_version: str
+    new_version: str
+    tag: str
+    # Whether the tag has been created (add_tag and not dry_run)
+    tagged: bool
+    files: list[Path]
+    commit: str | None
+    # Duration of each step, in seconds
+    timings: dict[str, float] = field(default_factory=dict)
+
+
+@contextlib.contextmanager
+def _timed(timings: dict[str, float], step: str):
+    _start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[step] = time.perf_counter() - _start
+
+
 def bump_project(
     config: Config,
     sign_commits: bool = False,
@@ -34,46 +169,53 @@ def bump_project(
     no_reset_git: bool = False,
     add_tag: bool = True,
     pre_release: str | None = None,
-):
+    push: bool = False,
+    remote: str = "origin",
+    reachable_tags_only: bool = True,
+) -> BumpResult:
     """
     Bump the version of the project, create a commit and tag and commit the changes.
     You can also add files to be added to the commit.
-    If add_tag is specified, it will also create a tag with the new version. Otherwise
-    it'll just print the new tag.
+    If add_tag is specified, it will also create a tag with the new version.
+    The new tag is returned in the result in any case.
+    If push is specified, the commit and the tag are pushed to the remote in a single atomic push.
+    The config version is updated in place, so the same config can be used for successive bumps.
+    If reachable_tags_only is specified (default), only the tags reachable from the current commit are considered.
     """
     # Setup git
     current_version = config.version
+    timings: dict[str, float] = {}
+    files: list[Path] = []
+    commit = None
     with set_cd(config.project_path):
         with git_setup(sign_commits=sign_commits, no_reset=no_reset_git):
             # Get the latest stable and release tags for the branch
-            fetch_tags(force=force)
-            _latest_stable_tag = get_latest_stable_tag()
-            _branch = branch or get_current_branch()
-            _release = pre_release or get_branch_release(_branch, releases=config.releases)
-            # If no latest tag, use the current version
-            if _latest_stable_tag is None:
-                (major, minor, path), release = parse_version(current_version)
-                _latest_stable_tag = f"v{major}.{max(minor - 1, 1)}.{path}"
-
-            _latest_release_tag = get_latest_release_tag(_release)
-            _new_tag = get_new_tag(
-                stable_tag=_latest_stable_tag,
-                release_tag=_latest_release_tag,
-                last_commit_message=last_commit_message or get_last_commit_message(),
-                release=_release,
-            )
+            with _timed(timings, "fetch"):
+                fetch_tags(force=force)
+            with _timed(timings, "tags"):
+                _branch = branch or get_current_branch()
+                _release = pre_release or get_branch_release(_branch, releases=config.releases)
+                _next_tag = get_next_tag(
+                    config,
+                    release=_release,
+                    ref="HEAD" if reachable_tags_only else None,
+                    index=TagIndex(prefix=config.tag_prefix),
+                    last_commit_message=last_commit_message or get_last_commit_message(),
+                )
+            _new_tag = _next_tag.new_tag
 
-            new_version = _new_tag.removeprefix("v")
+            new_version = _new_tag.removeprefix(config.tag_prefix)
             logger.info(
-                f"Stable tag: {TAG_START}{_latest_stable_tag}{TAG_END} | "
-                f"Latest release tag: {TAG_START}{_latest_release_tag}{TAG_END} | "
+                f"Stable tag: {TAG_START}{_next_tag.stable_tag}{TAG_END} | "
+                f"Latest release tag: {TAG_START}{_next_tag.release_tag}{TAG_END} | "
                 f"New version: {new_version} "
                 f"(branch: {_branch}, release: {_release})"
             )
 
-            version_files = config.version_files + [f"{config.config_path.name}:version"]
+            version_files = config.version_files + [config.config_version_file]
             if not dry_run:
-                replace_in_files(config.config_path, version_files, new_version)
+                with _timed(timings, "files"):
+                    files = replace_in_files(config.config_path, version_files, new_version)
             else:
                 logger.info(
                     f"{DRY_RUN_START}Would replace version with {new_version} in files:\n - {'\n - '.join(version_files)}"
@@ -81,14 +223,233 @@ def bump_project(
             _bump_message = config.bump_message.format(current_version=current_version, new_version=new_version)
             if not dry_run:
                 logger.info(f"Committing with message: {COMMIT_START}{_bump_message}{COMMIT_END}")
-                git_commit(_bump_message)
-                if add_tag:
-                    git_tag(_new_tag)
+                with _timed(timings, "commit"):
+                    git_commit(_bump_message)
+                    if add_tag:
+                        git_tag(_new_tag)
+                    commit = get_head_commit()
+                if add_tag and config.pack_refs_threshold is not None:
+                    with _timed(timings, "pack_refs"):
+                        pack_refs(config.pack_refs_threshold)
+                if push:
+                    logger.info(f"Pushing to {remote} (branch: {_branch})")
+                    with _timed(timings, "push"):
+                        git_push(remote, branch=_branch, tag=_new_tag if add_tag else None)
+                config.version = new_version
             else:
                 logger.info(
                     f"{DRY_RUN_START}Would commit with message: {COMMIT_START}{_bump_message}{COMMIT_END} "
                     f"and tag: {TAG_START}{_new_tag}{TAG_END}{DRY_RUN_END}"
                 )
+                if push:
+                    logger.info(f"{DRY_RUN_START}Would push to {remote} (branch: {_branch}){DRY_RUN_END}")
             logger.info("Done")
-            if not add_tag:
-                print(_new_tag)
+    return BumpResult(
+        old_version=current_version,
+        new_version=new_version,
+        tag=_new_tag,
+        tagged=add_tag and not dry_run,
+        files=files,
+        commit=commit,
+        timings=timings,
+    )
+
+
+class TagReservationError(Exception):
+    pass
+
+
+def _rollback_bump(config: Config, head: str, tag: str | None = None):
+    """
+    Undo a bump: delete the local tag (if any) and, if a bump commit has been made on top of head,
+    move back to head and restore the version files. Uncommitted changes are left untouched otherwise.
+    """
+    if tag is not None and tag_exists(tag):
+        delete_tags([tag])
+    if get_head_commit() == head:
+        return
+    git_reset(head)
+    _paths = group_version_files(config.config_path, config.version_files + [config.config_version_file])
+    git_restore(head, list_tracked_files(*(str(_path) for _path in _paths)))
+
+
+def bump_project_with_reservation(
+    config: Config,
+    sign_commits: bool = False,
+    branch: str | None = None,
+    last_commit_message: str | None = None,
+    no_reset_git: bool = False,
+    pre_release: str | None = None,
+    push: bool = False,
+    remote: str = "origin",
+    max_retries: int = 5,
+    backoff: float = 0.5,
+) -> BumpResult:
+    """
+    Bump the project and reserve the new tag on the remote with a compare-and-swap push,
+    so several jobs can bump the same repository concurrently.
+    If the tag has already been pushed by another job (or fetched locally), the bump is rolled back (the local tag
+    is deleted and the bump commit is undone) and the tag is recomputed after an exponential backoff.
+    Since the tags of the other jobs do not need to be reachable from the current commit,
+    all the tags are considered when push is not specified. Otherwise, the branch is rebased on the remote branch
+    before the first attempt and on conflict, and pushed atomically with the tag.
+    """
+    with set_cd(config.project_path):
+        _branch = branch or get_current_branch()
+        if push:
+            git_pull_rebase(remote, _branch)
+            config.version = Config.from_file(config.config_path, default_branch=config.default_branch).version
+    for _attempt in range(max_retries + 1):
+        _version = config.version
+        with set_cd(config.project_path):
+            _head = get_head_commit()
+        # Tags are force fetched since the ones of the other jobs may have replaced our rolled back tags.
+        # The tag is created here: it may already exist locally if it has been fetched but is not reachable
+        _tag = None
+        try:
+            result = bump_project(
+                config,
+                sign_commits=sign_commits,
+                branch=_branch,
+                last_commit_message=last_commit_message,
+                force=True,
+                no_reset_git=no_reset_git,
+                add_tag=False,
+                pre_release=pre_release,
+                reachable_tags_only=push,
+            )
+            with set_cd(config.project_path):
+                if tag_exists(result.tag):
+                    logger.warning(f"Tag {result.tag} already exists locally (attempt {_attempt + 1})")
+                    _reserved = False
+                else:
+                    git_tag(result.tag)
+                    _tag = result.tag
+                    result.tagged = True
+                    _reserved = reserve_tag(remote, result.tag, branch=_branch if push else None)
+                    if not _reserved:
+                        logger.warning(f"Tag {result.tag} is already taken on {remote} (attempt {_attempt + 1})")
+        except BaseException:
+            # Nothing of a failed attempt is left behind: neither the bump commit nor the local tag
+            with set_cd(config.project_path):
+                _rollback_bump(config, _head, tag=_tag)
+            config.version = _version
+            raise
+        with set_cd(config.project_path):
+            if _reserved:
+                logger.info(f"Reserved tag {TAG_START}{result.tag}{TAG_END} on {remote}")
+                if config.pack_refs_threshold is not None:
+                    pack_refs(config.pack_refs_threshold)
+                return result
+            _rollback_bump(config, _head, tag=_tag)
+            config.version = _version
+            time.sleep(backoff * 2**_attempt * random.uniform(0.5, 1.5))
+            if push:
+                git_pull_rebase(remote, _branch)
+                config.version = Config.from_file(config.config_path, default_branch=config.default_branch).version
+    raise TagReservationError(f"Could not reserve a tag on {remote} after {max_retries + 1} attempts")
+
+
+def set_dev_version(config: Config, style: Literal["semver", "pep440"] = "semver", dry_run: bool = False) -> str:
+    """
+    Compute a development version from the closest tag and the number of commits since it
+    (see `get_dev_version`) and write it to the version files, without committing nor tagging.
+    If there is no tag yet, the version of the config is used as the closest tag (or the version it has
+    been computed from, if it is already a development version, so running it again gives the same version).
+    """
+    with set_cd(config.project_path):
+        _described = git_describe(match=f"{config.tag_prefix}[0-9]*")
+        if _described is None:
+            _tag, _distance, _commit = (
+                f"{config.tag_prefix}{get_dev_version_base(config.version)}",
+                get_commit_count(),
+                get_head_commit(),
+            )
+        else:
+            _tag, _distance, _commit = _described
+    dev_version = get_dev_version(_tag, distance=_distance, commit=_commit[:7], style=style, prefix=config.tag_prefix)
+    logger.info(f"Closest tag: {TAG_START}{_tag}{TAG_END} ({_distance} commits) | Dev version: {dev_version}")
+
+    version_files = config.version_files + [config.config_version_file]
+    if dry_run:
+        logger.info(
+            f"{DRY_RUN_START}Would replace version with {dev_version} in files:\n - {'\n - '.join(version_files)}"
+        )
+    else:
+        replace_in_files(config.config_path, version_files, dev_version)
+        config.version = dev_version
+    return dev_version
+
+
+def promote_tag(
+    config: Config,
+    tag: str,
+    update_files: bool = False,
+    sign_commits: bool = False,
+    no_reset_git: bool = False,
+    push: bool = False,
+    remote: str = "origin",
+    dry_run: bool = False,
+) -> BumpResult:
+    """
+    Promote an existing pre-release tag (for instance v0.2.0-rc.1) to its stable version (v0.2.0)
+    by tagging the same commit, without computing a new version nor rebuilding anything.
+    If update_files is specified, the version files are updated in a commit on top of the current branch
+    and the stable tag is created on this commit instead: the current commit must then contain the
+    pre-release commit, so the stable release ships the code that has been approved.
+    """
+    _prefix = config.tag_prefix
+    try:
+        (major, minor, patch), release = parse_version(tag, prefix=_prefix)
+    except ValueError:
+        raise ValueError(f"Invalid tag: {tag!r}") from None
+    if not tag.startswith(_prefix) or release is None:
+        raise ValueError(f"{tag!r} is not a pre-release tag (expected {_prefix}X.Y.Z-<release>.N)")
+    stable_tag = f"{_prefix}{major}.{minor}.{patch}"
+    new_version = stable_tag.removeprefix(_prefix)
+    current_version = config.version
+    files: list[Path] = []
+    with set_cd(config.project_path):
+        _index = TagIndex(prefix=_prefix)
+        commit = _index.resolve(f"refs/tags/{tag}")
+        if commit is None:
+            raise ValueError(f"Tag {tag!r} not found")
+        if _index.resolve(f"refs/tags/{stable_tag}") is not None:
+            raise ValueError(f"Tag {stable_tag!r} already exists")
+        if update_files and not is_ancestor(commit, "HEAD"):
+            raise ValueError(
+                f"HEAD does not contain {tag!r} ({commit}): merge it before promoting it with update_files"
+            )
+        logger.info(f"Promoting {TAG_START}{tag}{TAG_END} to {TAG_START}{stable_tag}{TAG_END} ({commit})")
+        if dry_run:
+            logger.info(f"{DRY_RUN_START}Would tag {commit} with {stable_tag}{DRY_RUN_END}")
+            return BumpResult(
+                old_version=current_version,
+                new_version=new_version,
+                tag=stable_tag,
+                tagged=False,
+                files=[],
+                commit=None,
+            )
+        with git_setup(sign_commits=sign_commits, no_reset=no_reset_git):
+            if update_files:
+                version_files = config.version_files + [config.config_version_file]
+                files = replace_in_files(config.config_path, version_files, new_version)
+                _bump_message = config.bump_message.format(current_version=current_version, new_version=new_version)
+                logger.info(f"Committing with message: {COMMIT_START}{_bump_message}{COMMIT_END}")
+                git_commit(_bump_message)
+                commit = get_head_commit()
+                config.version = new_version
+            git_tag(stable_tag, commit)
+            if push:
+                _branch = get_current_branch() if update_files else None
+                logger.info(f"Pushing to {remote}" + (f" (branch: {_branch})" if _branch else ""))
+                git_push(remote, branch=_branch, tag=stable_tag)
+    return BumpResult(
+        old_version=current_version,
+        new_version=new_version,
+        tag=stable_tag,
+        tagged=True,
+        files=files,
+        commit=commit,
+    )
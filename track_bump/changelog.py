@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import re
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+from .config import Config
+from .logs import logger
+from .tags import get_tag_ranges
+from .utils import get_git_paths, get_tags, get_tags_commits, get_toplevel, set_cd, stream_cmd
+
+__all__ = (
+    "ChangelogCommit",
+    "iter_commits",
+    "group_commits",
+    "render_section",
+    "generate_changelog",
+)
+
+# To bump whenever the rendering changes, so the cached sections are rendered again
+_CACHE_VERSION = 1
+_CACHE_PATH = "track-bump/changelog.json"
+
+_CONVENTIONAL_COMMIT_REG = re.compile(r"^(?P<type>\w+)(?:\((?P<scope>[^)]*)\))?(?P<breaking>!)?:\s*(?P<subject>.+)$")
+_BREAKING_CHANGE_REG = re.compile(r"^BREAKING[ -]CHANGE:", flags=re.MULTILINE)
+# Title of the groups, in the order they are rendered. Commits of other types are grouped in "other"
+_GROUPS = {
+    "breaking": "Breaking changes",
+    "feat": "Features",
+    "fix": "Bug fixes",
+    "perf": "Performance",
+    "refactor": "Refactoring",
+    "docs": "Documentation",
+    "other": "Other changes",
+}
+# %x1f (unit separator) between the fields, commits separated by NUL bytes with -z
+_LOG_FORMAT = "%H%x1f%s%x1f%b"
+
+
+@dataclass
+class ChangelogCommit:
+    commit: str
+    type: str
+    scope: str | None
+    subject: str
+    breaking: bool = False
+
+
+def _parse_commit(record: str) -> ChangelogCommit:
+    _commit, _subject, _body = record.split("\x1f", 2)
+    if _match := _CONVENTIONAL_COMMIT_REG.match(_subject):
+        return ChangelogCommit(
+            commit=_commit,
+            type=_match["type"].lower(),
+            scope=_match["scope"] or None,
+            subject=_match["subject"],
+            breaking=bool(_match["breaking"]) or bool(_BREAKING_CHANGE_REG.search(_body)),
+        )
+    return ChangelogCommit(commit=_commit, type="other", scope=None, subject=_subject)
+
+
+def iter_commits(rev_range: str, path: str = ".") -> Iterator[ChangelogCommit]:
+    """
+    Stream the commits of the range (for instance v0.1.0..v0.2.0) touching the path, most recent first.
+    Merge commits are skipped.
+    """
+    for _record in stream_cmd(
+        f"git log -z --no-merges --format='{_LOG_FORMAT}' {rev_range} -- '{path}'", separator="\0"
+    ):
+        if _record.strip():
+            yield _parse_commit(_record.lstrip("\n"))
+
+
+def _get_release_commit_reg(bump_message: str) -> re.Pattern:
+    """
+    Return a regex matching the commits created by a bump, for instance "chore: release {new_version}"
+    """
+    _parts = re.split(r"\{\w*\}", bump_message)
+    return re.compile("^" + ".+".join(re.escape(_part) for _part in _parts) + "$")
+
+
+def group_commits(
+    commits: Iterable[ChangelogCommit], skip_reg: re.Pattern | None = None
+) -> dict[str, list[ChangelogCommit]]:
+    """
+    Group the commits by conventional commit type as they are read (breaking changes first),
+    skipping the ones whose "type: subject" matches skip_reg (the bump commits)
+    """
+    groups: dict[str, list[ChangelogCommit]] = {}
+    for _commit in commits:
+        _message = f"{_commit.type}{f'({_commit.scope})' if _commit.scope else ''}: {_commit.subject}"
+        if skip_reg is not None and (skip_reg.match(_message) or skip_reg.match(_commit.subject)):
+            continue
+        _group = "breaking" if _commit.breaking else _commit.type if _commit.type in _GROUPS else "other"
+        groups.setdefault(_group, []).append(_commit)
+    return groups
+
+
+def render_section(title: str, date: str | None, groups: dict[str, list[ChangelogCommit]]) -> str:
+    """
+    Render the changelog section of a release in markdown
+    """
+    _lines = [f"## {title}" + (f" ({date})" if date else ""), ""]
+    for _group, _title in _GROUPS.items():
+        if not (_commits := groups.get(_group)):
+            continue
+        _lines += [f"### {_title}", ""]
+        for _commit in _commits:
+            _scope = f"**{_commit.scope}:** " if _commit.scope else ""
+            _lines.append(f"- {_scope}{_commit.subject} ({_commit.commit[:7]})")
+        _lines.append("")
+    if len(_lines) == 2:
+        _lines += ["No changes", ""]
+    return "\n".join(_lines)
+
+
+def _load_cache(cache_path: Path) -> dict[str, str]:
+    try:
+        return json.loads(cache_path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache_path: Path, cache: dict[str, str]):
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        cache_path.write_text(json.dumps(cache))
+    except OSError as e:
+        logger.warning(f"Could not write the changelog cache {cache_path}: {e}")
+
+
+def generate_changelog(
+    config: Config,
+    tag: str | None = None,
+    count: int | None = 1,
+    release: str = "stable",
+    next_tag: str | None = None,
+    use_cache: bool = True,
+) -> str:
+    """
+    Generate the changelog sections of the tags of the release, most recent first:
+        - of the given tag only
+        - or of the `count` most recent tags (all of them if count is None)
+    Each section lists the commits between the previous tag (see `get_tag_ranges`) and the tag touching the
+    project, grouped by conventional commit type.
+    With next_tag, a section with the commits since the most recent tag is added first, titled next_tag.
+    Since a tag range never changes, the rendered sections are cached in the git directory by the commits
+    of the range: regenerating the changelog only reads the history of the new ranges.
+    """
+    with set_cd(config.project_path):
+        _tags_commits = get_tags_commits(config.tag_prefix)
+        _all_ranges = get_tag_ranges(get_tags(config.tag_prefix), release=release, prefix=config.tag_prefix)
+        if tag is not None:
+            _ranges = [_range for _range in _all_ranges if _range[1] == tag]
+            if not _ranges:
+                raise ValueError(f"Tag {tag!r} not found among the {release} tags")
+        else:
+            _ranges = _all_ranges if count is None else _all_ranges[:count]
+        _project = os.path.relpath(config.project_path.resolve(), get_toplevel().resolve())
+        (_cache_path,) = get_git_paths(_CACHE_PATH)
+        _cache = _load_cache(_cache_path) if use_cache else {}
+        _skip_reg = _get_release_commit_reg(config.bump_message)
+
+        sections = []
+        if next_tag is not None:
+            _previous_tag = _all_ranges[0][1] if _all_ranges else None
+            _commits = iter_commits(f"{_previous_tag}..HEAD" if _previous_tag else "HEAD")
+            sections.append(render_section(next_tag, None, group_commits(_commits, _skip_reg)))
+
+        _new_sections = 0
+        for _previous_tag, _tag in _ranges:
+            _previous_commit = _tags_commits[_previous_tag][0] if _previous_tag else ""
+            _commit, _date = _tags_commits[_tag]
+            _key = hashlib.sha256(
+                "\0".join(
+                    [str(_CACHE_VERSION), _project, config.bump_message, _previous_commit, _tag, _commit, _date]
+                ).encode()
+            ).hexdigest()
+            if (_section := _cache.get(_key)) is None:
+                _commits = iter_commits(f"{_previous_commit}..{_commit}" if _previous_commit else _commit)
+                _section = _cache[_key] = render_section(_tag, _date, group_commits(_commits, _skip_reg))
+                _new_sections += 1
+            sections.append(_section)
+        logger.debug(f"Rendered {_new_sections} changelog sections, {len(_ranges) - _new_sections} from the cache")
+        if use_cache and _new_sections:
+            _save_cache(_cache_path, _cache)
+    return "\n".join(sections)
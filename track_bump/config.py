@@ -1,12 +1,25 @@
+import copy
 import json
-import re
+import os
 import tomllib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass, field
 from pathlib import Path
 
 from .logs import logger
+from .scanner import find_json_values, find_toml_tables, find_values, read_value, replace_values
+from .tags import DEFAULT_TAG_PREFIX
 
-__all__ = ("Config", "replace_in_file", "replace_in_files")
+__all__ = (
+    "Config",
+    "replace_in_file",
+    "replace_in_files",
+    "parse_version_file",
+    "group_version_files",
+    "check_files",
+    "read_versions",
+    "VersionDrift",
+)
 
 from track_bump import env
 
@@ -19,7 +32,16 @@ def get_default_releases() -> dict[str, str]:
     }
 
 
-def replace_in_file(file_path: Path, version: str, tag: str):
+def replace_in_text(text: str, suffix: str, version: str, tags: tuple[str, ...]) -> str:
+    """
+    Replace all the given tags with the new version in a single scan of the text.
+    Tags can be dotted key paths (for instance "tool.poetry.version"), see `find_values`.
+    """
+    _found = find_values(text, suffix, tags)
+    return replace_values(text, [_span for _spans in _found.values() for _span in _spans], version)
+
+
+def replace_in_file(file_path: Path, version: str, tag: str | tuple[str, ...]) -> bool:
     """
     Replace the tag with the new version in the given file
     For example, if the file contains:
@@ -27,20 +49,92 @@ def replace_in_file(file_path: Path, version: str, tag: str):
     and you call replace_in_file(file_path, "0.2.0", "version")
     The file will be updated to:
         version = "0.2.0"
+    Several tags can be given at once, the file is then read and written only once.
+    A warning is logged for each tag that cannot be found.
+    Returns whether the file has been written.
     """
-    match file_path.suffix:
-        case ".toml":
-            _new_text = re.sub(rf'^{tag} = "(.*)"$', rf'{tag} = "{version}"', file_path.read_text(), flags=re.MULTILINE)
-        case ".json":
-            _new_text = re.sub(rf'"({tag})": "(.*)"', rf'"{tag}": "{version}"', file_path.read_text())
-        case _:
-            raise ValueError(f"Only .toml and .json files are supported")
+    _tags = (tag,) if isinstance(tag, str) else tag
+    _text = file_path.read_text()
+    _found = find_values(_text, file_path.suffix, _tags)
+    for _tag, _spans in _found.items():
+        if not _spans:
+            logger.warning(f"{_tag!r} not found in {file_path}, it is not updated")
+    _new_text = replace_values(_text, [_span for _spans in _found.values() for _span in _spans], version)
+    if _new_text == _text:
+        return False
     file_path.write_text(_new_text)
+    # Do not rely on the modification time only: the file may be rewritten within its resolution
+    _CONFIG_DATA_CACHE.pop(file_path.absolute(), None)
+    return True
 
 
 CONFIG_FILES = [".cz.toml", "pyproject.toml", "package.json"]
 
 
+def _extract_toml_config(text: str) -> dict | None:
+    """
+    Parse only the [tool.track-bump] table (and its sub-tables) of a TOML document.
+    Returns None if the table cannot be isolated (no such table, config defined with dotted keys
+    or inline tables...) so the whole document is parsed instead
+    """
+    _spans = find_toml_tables(text, "tool.track-bump")
+    if not _spans:
+        return None
+    try:
+        return tomllib.loads("\n".join(text[_start:_end] for _start, _end in _spans))["tool"]["track-bump"]
+    except (tomllib.TOMLDecodeError, KeyError):
+        return None
+
+
+def _extract_json_config(text: str) -> dict | None:
+    """
+    Decode only the "track-bump" and "version" keys of a JSON document, the other values are skipped
+    Returns None if the document is not a regular JSON object, so it is decoded entirely instead
+    """
+    try:
+        _found = find_json_values(text, ("track-bump", "version"))
+        return {_key: json.loads(text[_spans[0][0] : _spans[0][1]]) for _key, _spans in _found.items() if _spans}
+    except ValueError:
+        return None
+
+
+# Parsed configs, by path, with the (mtime, size) of the file when it was parsed
+_CONFIG_DATA_CACHE: dict[Path, tuple[tuple[int, int], dict | None, str | None]] = {}
+
+
+def load_config_data(config_path: Path) -> tuple[dict | None, str | None]:
+    """
+    Return the track-bump config table of the file and the version, using only the relevant part
+    of the file when possible. Results are cached until the modification time or the size of the file changes.
+    """
+    _path = config_path.absolute()
+    _stat = _path.stat()
+    _key = (_stat.st_mtime_ns, _stat.st_size)
+    if (_cached := _CONFIG_DATA_CACHE.get(_path)) is not None and _cached[0] == _key:
+        return copy.deepcopy(_cached[1]), _cached[2]
+
+    logger.debug(f"Parsing {config_path}")
+    _text = _path.read_text()
+    if config_path.suffix == ".toml":
+        _config = _extract_toml_config(_text)
+        if _config is None:
+            logger.debug(f"Could not extract tool.track-bump from {config_path}, parsing the whole file")
+            _config = tomllib.loads(_text).get("tool", {}).get("track-bump")
+        version = _config.get("version") if _config is not None else None
+    elif config_path.suffix == ".json":
+        data = _extract_json_config(_text)
+        if data is None:
+            logger.debug(f"Could not extract track-bump from {config_path}, parsing the whole file")
+            data = json.loads(_text)
+        _config = data.get("track-bump")
+        version = data.get("version")
+    else:
+        raise ValueError("Only .toml and .json files are supported")
+
+    _CONFIG_DATA_CACHE[_path] = (_key, _config, version)
+    return copy.deepcopy(_config), version
+
+
 @dataclass
 class Config:
     version: str
@@ -48,6 +142,10 @@ class Config:
     version_files: list[str]
     default_branch: str
     releases: dict[str, str] = field(default_factory=get_default_releases)
+    # Prefix of the tags, for instance "pkg-a/v" or "pkg-a@" for independently versioned packages
+    tag_prefix: str = DEFAULT_TAG_PREFIX
+    # If set, the refs are packed after a bump once there are more loose tag refs than this threshold
+    pack_refs_threshold: int | None = None
 
     _config_path: Path = field(init=False)
 
@@ -60,6 +158,15 @@ class Config:
     def config_path(self) -> Path:
         return self._config_path
 
+    @property
+    def config_version_file(self) -> str:
+        """
+        The version_files entry pointing to the version of the config file itself.
+        The bare "version" key is kept on purpose: in a pyproject.toml, it also updates [project] version
+        (or any other table's version), like it always did.
+        """
+        return f"{self._config_path.name}:version"
+
     @property
     def project_path(self) -> Path:
         return self._config_path.parent
@@ -68,22 +175,11 @@ class Config:
     def from_file(cls, config_path: Path, default_branch: str = env.DEFAULT_BRANCH):
         if not config_path.exists():
             raise FileNotFoundError(f"{config_path} not found")
-        logger.debug(f"Parsing {config_path}")
-
-        if config_path.suffix == ".toml":
-            data = tomllib.loads(config_path.read_text())
-            _config = data.get("tool", {}).get("track-bump")
-            if _config is None:
-                raise ValueError(f"Could not find config tool.track-bump in {config_path!r}")
-            version = _config.get("version")
-        elif config_path.suffix == ".json":
-            data = json.loads(config_path.read_text())
-            _config = data.get("track-bump")
-            if _config is None:
-                raise ValueError(f"Could not find config track-bump in {config_path}")
-            version = data.get("version")
-        else:
-            raise ValueError("Only .toml and .json files are supported")
+
+        _config, version = load_config_data(config_path)
+        if _config is None:
+            _name = "tool.track-bump" if config_path.suffix == ".toml" else "track-bump"
+            raise ValueError(f"Could not find config {_name} in {config_path}")
 
         if version is None:
             raise ValueError("version is required in config file")
@@ -94,22 +190,30 @@ class Config:
         version_files = _config.get("version_files") or _config.get("versionFiles") or []
 
         releases = _config.get("releases") or get_default_releases()
+        # An empty prefix is valid (unprefixed tags such as 1.2.0)
+        tag_prefix = _config.get("tag_prefix", _config.get("tagPrefix"))
+        if tag_prefix is None:
+            tag_prefix = DEFAULT_TAG_PREFIX
+        pack_refs_threshold = _config.get("pack_refs_threshold", _config.get("packRefsThreshold"))
         config = cls(
             version=version,
             bump_message=bump_message,
             version_files=version_files,
             releases=releases,
             default_branch=default_branch,
+            tag_prefix=tag_prefix,
+            pack_refs_threshold=pack_refs_threshold,
         )
         config._config_path = config_path
         return config
 
     @classmethod
     def from_project(cls, project_path: Path, default_branch: str = env.DEFAULT_BRANCH):
-        # Check if any of the config files exist
+        # Check if any of the config files exist, listing the directory only once
+        _files = set(os.listdir(project_path))
         for file in CONFIG_FILES:
-            config_path = Path(project_path / file)
-            if config_path.exists():
+            if file in _files:
+                config_path = Path(project_path / file)
                 logger.debug(f"Found config file: {config_path}")
                 break
         else:
@@ -118,18 +222,92 @@ class Config:
         return cls.from_file(config_path, default_branch=default_branch)
 
 
-def replace_in_files(config_path: Path, files: list[str], version: str):
+def parse_version_file(version_file: str) -> tuple[str, str]:
+    """
+    Parse a version_files entry ("path" or "path:tag") and return the path and the tag
+    """
+    try:
+        _path, _tag = version_file.split(":")
+    except ValueError:
+        _path = version_file
+        _tag = "version"
+    return _path, _tag
+
+
+def group_version_files(config_path: Path, files: list[str]) -> dict[Path, tuple[str, ...]]:
     """
-    Replace the version in the given files
+    Group the version files by path, keeping the declaration order, so that each file
+    is processed only once with all of its tags
     """
+    _grouped: dict[Path, list[str]] = {}
     for _file in files:
-        try:
-            _path, _tag = _file.split(":")
-        except ValueError:
-            _path = _file
-            _tag = "version"
-        _file_path = Path(config_path.parent / _path)
+        _path, _tag = parse_version_file(_file)
+        _tags = _grouped.setdefault(Path(config_path.parent / _path), [])
+        if _tag not in _tags:
+            _tags.append(_tag)
+    return {_path: tuple(_tags) for _path, _tags in _grouped.items()}
+
+
+def replace_in_files(config_path: Path, files: list[str], version: str) -> list[Path]:
+    """
+    Replace the version in the given files and return the files that have been written
+    """
+    _grouped = group_version_files(config_path, files)
+    for _file_path in _grouped:
         if not _file_path.exists():
             raise FileNotFoundError(f"{_file_path} not found")
-        logger.debug(f"Replacing in {_file_path}")
-        replace_in_file(_file_path, version=version, tag=_tag)
+    _written = []
+    for _file_path, _tags in _grouped.items():
+        logger.debug(f"Replacing {', '.join(_tags)} in {_file_path}")
+        if replace_in_file(_file_path, version=version, tag=_tags):
+            _written.append(_file_path)
+    return _written
+
+
+@dataclass
+class VersionDrift:
+    file_path: Path
+    tag: str
+    # None if the file or the tag could not be found
+    found: str | None
+
+
+def read_versions(file_path: Path, tags: tuple[str, ...]) -> dict[str, list[str]]:
+    """
+    Return the values of the given tags in the file, without modifying it
+    """
+    _text = file_path.read_text()
+    _found = find_values(_text, file_path.suffix, tags)
+    return {_tag: [read_value(_text, _span, file_path.suffix) for _span in _spans] for _tag, _spans in _found.items()}
+
+
+def _check_file(file_path: Path, tags: tuple[str, ...], version: str) -> list[VersionDrift]:
+    if not file_path.exists():
+        return [VersionDrift(file_path=file_path, tag=_tag, found=None) for _tag in tags]
+    _drifts = []
+    for _tag, _values in read_versions(file_path, tags).items():
+        if not _values:
+            _drifts.append(VersionDrift(file_path=file_path, tag=_tag, found=None))
+        _drifts += [
+            VersionDrift(file_path=file_path, tag=_tag, found=_value) for _value in _values if _value != version
+        ]
+    return _drifts
+
+
+def check_files(
+    config_path: Path, files: list[str], version: str, fail_fast: bool = False, max_workers: int | None = None
+) -> list[VersionDrift]:
+    """
+    Check that the version of every given file matches the version, reading the files concurrently.
+    Returns the drifts found: if fail_fast is specified, the check stops at the first file with a drift.
+    """
+    _grouped = group_version_files(config_path, files)
+    _drifts = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        _futures = [executor.submit(_check_file, _file_path, _tags, version) for _file_path, _tags in _grouped.items()]
+        for _future in as_completed(_futures):
+            _drifts += _future.result()
+            if _drifts and fail_fast:
+                executor.shutdown(wait=False, cancel_futures=True)
+                break
+    return _drifts
@@ -0,0 +1,107 @@
+import fnmatch
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .config import CONFIG_FILES, Config, load_config_data
+from .logs import logger
+from .utils import get_git_paths, get_toplevel, list_tracked_files, set_cd
+
+__all__ = (
+    "discover_projects",
+    "find_projects",
+)
+
+_MANIFEST_PATH = "track-bump/projects.json"
+
+
+def _has_config(config_path: Path) -> bool:
+    try:
+        return load_config_data(config_path)[0] is not None
+    except (ValueError, OSError) as e:
+        logger.debug(f"Skipping {config_path}: {e}")
+        return False
+
+
+def _read_manifest(manifest_path: Path, index_key: list[int]) -> list[str] | None:
+    try:
+        _manifest = json.loads(manifest_path.read_text())
+    except (OSError, ValueError):
+        return None
+    return _manifest["projects"] if _manifest.get("index") == index_key else None
+
+
+def _write_manifest(manifest_path: Path, index_key: list[int], projects: list[str]):
+    try:
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        manifest_path.write_text(json.dumps({"index": index_key, "projects": projects}))
+    except OSError as e:
+        logger.warning(f"Could not write the projects manifest {manifest_path}: {e}")
+
+
+def _discover_projects(path: Path | None, use_cache: bool, max_workers: int | None) -> tuple[Path, list[str]]:
+    """
+    Return the root of the repository and the config files of the projects, relative to the root
+    """
+    with set_cd(path or Path.cwd()):
+        _root = get_toplevel()
+        _index_path, _manifest_path = get_git_paths("index", _MANIFEST_PATH)
+    try:
+        _stat = _index_path.stat()
+        _index_key = [_stat.st_mtime_ns, _stat.st_size]
+    except FileNotFoundError:
+        _index_key = None
+
+    if use_cache and _index_key is not None and (_projects := _read_manifest(_manifest_path, _index_key)) is not None:
+        logger.debug(f"Using the projects manifest {_manifest_path}")
+        return _root, _projects
+
+    with set_cd(_root):
+        _files = list_tracked_files(*(f":(glob)**/{_name}" for _name in CONFIG_FILES))
+    # Candidate config files of each directory, in the order of CONFIG_FILES
+    _candidates: dict[str, list[str]] = defaultdict(list)
+    for _file in sorted(_files, key=lambda x: CONFIG_FILES.index(os.path.basename(x))):
+        _candidates[os.path.dirname(_file)].append(_file)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        _has_configs = dict(zip(_files, executor.map(lambda x: _has_config(_root / x), _files)))
+    projects = sorted(
+        _project
+        for _dir_files in _candidates.values()
+        if (_project := next((_file for _file in _dir_files if _has_configs[_file]), None)) is not None
+    )
+    logger.debug(f"Found {len(projects)} projects out of {len(_files)} candidate config files")
+
+    if _index_key is not None:
+        _write_manifest(_manifest_path, _index_key, projects)
+    return _root, projects
+
+
+def discover_projects(path: Path | None = None, use_cache: bool = True, max_workers: int | None = None) -> list[Path]:
+    """
+    Return the config files of every project of the git repository containing path (default: current directory).
+    The candidate config files are listed with a single `git ls-files` call, so ignored directories
+    (node_modules, build, ...) are never walked, and loaded concurrently. In each directory, the first
+    of CONFIG_FILES with a track-bump config is the project config, like `Config.from_project`.
+    The result is cached in the git directory until the index changes (files added, removed, staged...).
+    """
+    _root, _projects = _discover_projects(path, use_cache=use_cache, max_workers=max_workers)
+    return [_root / _project for _project in _projects]
+
+
+def find_projects(
+    patterns: list[str], path: Path | None = None, use_cache: bool = True, max_workers: int | None = None
+) -> list[Config]:
+    """
+    Return the configs of the projects whose directory, relative to the root of the repository,
+    matches any of the glob patterns (for instance "packages/*", "*" for every project, "." for the root project)
+    """
+    _root, _projects = _discover_projects(path, use_cache=use_cache, max_workers=max_workers)
+    _config_paths = [
+        _root / _project
+        for _project in _projects
+        if any(fnmatch.fnmatchcase(os.path.dirname(_project) or ".", _pattern) for _pattern in patterns)
+    ]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(Config.from_file, _config_paths))
@@ -0,0 +1,184 @@
+import fnmatch
+import functools
+import json
+import mmap
+import os
+import re
+import tomllib
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from .config import Config, group_version_files, parse_version_file
+from .logs import logger
+from .scanner import find_values
+from .utils import list_tracked_files, set_cd
+
+__all__ = (
+    "VersionOccurrence",
+    "scan_version",
+    "propose_version_files",
+)
+
+# Below this number of files, starting the worker processes costs more than scanning the files
+_PROCESS_POOL_MIN_FILES = 2000
+_CHUNK_SIZE = 256
+# Like git, a file with a NUL byte in its first 8000 bytes is considered binary
+_BINARY_CHECK_SIZE = 8000
+_MAX_LINE_LENGTH = 200
+
+
+@dataclass
+class VersionOccurrence:
+    file_path: Path
+    line: int
+    column: int
+    # Offset of the occurrence in the file, in bytes
+    offset: int
+    text: str
+    # Whether the occurrence is updated by a version_files entry
+    covered: bool = False
+
+
+def _get_version_pattern(version: str) -> bytes:
+    # 0.1.0 should neither match 10.1.0, 0.1.01, 0.1.0.1 nor 0.1.0-beta.1
+    return rb"(?<![0-9.])" + re.escape(version.encode()) + rb"(?![0-9A-Za-z]|[-+.][0-9A-Za-z])"
+
+
+def _scan_file(pattern: bytes, file_path: Path) -> list[tuple[int, int, int, str]]:
+    """
+    Return the (line, column, offset, line text) of the occurrences of the pattern in the file,
+    reading it through a memory map. Binary, empty and unreadable files are skipped.
+    """
+    try:
+        with file_path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if b"\0" in mm[:_BINARY_CHECK_SIZE]:
+                return []
+            occurrences = []
+            _line, _last = 1, 0
+            for _match in re.finditer(pattern, mm):
+                _start = _match.start()
+                _line += mm[_last:_start].count(b"\n")
+                _last = _start
+                _line_start = mm.rfind(b"\n", 0, _start) + 1
+                _line_end = mm.find(b"\n", _start)
+                _text = mm[_line_start : _line_end if _line_end != -1 else len(mm)]
+                occurrences.append(
+                    (_line, _start - _line_start + 1, _start, _text.decode(errors="replace").strip()[:_MAX_LINE_LENGTH])
+                )
+            return occurrences
+    except (OSError, ValueError):
+        # Directories (submodules, symlinks), empty files (cannot be mapped)...
+        return []
+
+
+def _is_covered(occurrence: VersionOccurrence, spans: list[tuple[int, int]]) -> bool:
+    return any(_start <= occurrence.offset < _end for _start, _end in spans)
+
+
+def _get_covered_spans(file_path: Path, tags: tuple[str, ...]) -> list[tuple[int, int]]:
+    """
+    Return the spans (in bytes) of the values updated by the tags in the file
+    """
+    try:
+        # Not read_text: the offsets must match the bytes of the file, \r\n included
+        _text = file_path.read_bytes().decode()
+        _found = find_values(_text, file_path.suffix, tags)
+    except (OSError, ValueError) as e:
+        logger.debug(f"Could not read the values of {file_path}: {e}")
+        return []
+    return [
+        (len(_text[:_start].encode()), len(_text[:_end].encode()))
+        for _spans in _found.values()
+        for _start, _end in _spans
+    ]
+
+
+def scan_version(
+    config: Config, exclude: list[str] | None = None, max_workers: int | None = None
+) -> list[VersionOccurrence]:
+    """
+    Search the version of the config in every file tracked by git in the project (except the files matching
+    the exclude glob patterns) and flag the occurrences updated by the version_files entries.
+    The files are listed with `git ls-files`, memory mapped and scanned by a pool of processes for large projects.
+    """
+    with set_cd(config.project_path):
+        _files = list_tracked_files()
+    if exclude:
+        _files = [_file for _file in _files if not any(fnmatch.fnmatchcase(_file, _pattern) for _pattern in exclude)]
+    _paths = [config.project_path / _file for _file in _files]
+    logger.debug(f"Scanning {len(_paths)} files for {config.version}")
+
+    _scan = functools.partial(_scan_file, _get_version_pattern(config.version))
+    _max_workers = max_workers or os.cpu_count() or 1
+    if _max_workers == 1 or len(_paths) < _PROCESS_POOL_MIN_FILES:
+        occurrences = _to_occurrences(_paths, map(_scan, _paths))
+    else:
+        with ProcessPoolExecutor(max_workers=_max_workers) as executor:
+            occurrences = _to_occurrences(_paths, executor.map(_scan, _paths, chunksize=_CHUNK_SIZE))
+
+    _grouped = group_version_files(config.config_path, config.version_files + [config.config_version_file])
+    _covered_spans: dict[Path, list[tuple[int, int]]] = {}
+    for occurrence in occurrences:
+        if (_tags := _grouped.get(occurrence.file_path)) is None:
+            continue
+        if occurrence.file_path not in _covered_spans:
+            _covered_spans[occurrence.file_path] = _get_covered_spans(occurrence.file_path, _tags)
+        occurrence.covered = _is_covered(occurrence, _covered_spans[occurrence.file_path])
+    return occurrences
+
+
+def _to_occurrences(paths: list[Path], results) -> list[VersionOccurrence]:
+    return [
+        VersionOccurrence(file_path=_path, line=_line, column=_column, offset=_offset, text=_text)
+        for _path, _file_occurrences in zip(paths, results)
+        for _line, _column, _offset, _text in _file_occurrences
+    ]
+
+
+def _iter_string_keys(data: dict, value: str, path: tuple[str, ...] = ()) -> Iterator[str]:
+    """
+    Yield the dotted keys of the string values equal to value
+    """
+    for _key, _value in data.items():
+        if "." in _key or ":" in _key:
+            # Cannot be expressed as a version_files entry
+            continue
+        if isinstance(_value, dict):
+            yield from _iter_string_keys(_value, value, path + (_key,))
+        elif _value == value:
+            yield ".".join(path + (_key,))
+
+
+def propose_version_files(config: Config, occurrences: list[VersionOccurrence]) -> list[str]:
+    """
+    Return the version_files entries that would cover the occurrences that are not covered yet.
+    Only the values of TOML and JSON files that are exactly the version can be proposed.
+    """
+    _uncovered: dict[Path, list[VersionOccurrence]] = {}
+    for occurrence in occurrences:
+        if not occurrence.covered and occurrence.file_path.suffix in (".toml", ".json"):
+            _uncovered.setdefault(occurrence.file_path, []).append(occurrence)
+
+    entries = []
+    for _file_path, _occurrences in _uncovered.items():
+        try:
+            _text = _file_path.read_bytes().decode()
+            _data = tomllib.loads(_text) if _file_path.suffix == ".toml" else json.loads(_text)
+        except (OSError, ValueError) as e:
+            logger.debug(f"Could not parse {_file_path}: {e}")
+            continue
+        if not isinstance(_data, dict):
+            continue
+        _keys = tuple(_iter_string_keys(_data, config.version))
+        _found = find_values(_text, _file_path.suffix, _keys) if _keys else {}
+        _path = _file_path.relative_to(config.project_path).as_posix()
+        for _key, _spans in _found.items():
+            _byte_spans = [(len(_text[:_start].encode()), len(_text[:_end].encode())) for _start, _end in _spans]
+            if not any(_is_covered(_occurrence, _byte_spans) for _occurrence in _occurrences):
+                continue
+            _entry = _path if _key == "version" else f"{_path}:{_key}"
+            if parse_version_file(_entry) not in map(parse_version_file, config.version_files):
+                entries.append(_entry)
+    return entries
@@ -0,0 +1,269 @@
+import json
+import re
+
+__all__ = (
+    "find_values",
+    "find_toml_values",
+    "find_json_values",
+    "find_toml_tables",
+    "read_value",
+    "replace_values",
+)
+
+type Span = tuple[int, int]
+
+# TOML
+_TOML_KEY_PART = r"""(?:[A-Za-z0-9_-]+|"(?:[^"\\\n]|\\.)*"|'[^'\n]*')"""
+_TOML_KEY = rf"{_TOML_KEY_PART}(?:[ \t]*\.[ \t]*{_TOML_KEY_PART})*"
+_TOML_KEY_PARTS_REG = re.compile(_TOML_KEY_PART)
+_TOML_HEADER_REG = re.compile(rf"^[ \t]*\[\[?[ \t]*(?P<key>{_TOML_KEY})[ \t]*\]")
+_TOML_VALUE_REG = re.compile(rf"""^[ \t]*(?P<key>{_TOML_KEY})[ \t]*=[ \t]*(?P<value>"(?:[^"\\\n]|\\.)*"|'[^'\n]*')""")
+_TOML_ASSIGNMENT_REG = re.compile(rf"^[ \t]*(?P<key>{_TOML_KEY})[ \t]*=")
+_TOML_MULTILINE_REG = re.compile(r'"""|\'\'\'')
+_TOML_BRACKET_REG = re.compile(r""""(?:[^"\\\n]|\\.)*"|'[^'\n]*'|#|[\[\]{}]""")
+
+# JSON
+_JSON_STRING_REG = re.compile(r'"(?:[^"\\]|\\.)*"', flags=re.DOTALL)
+_JSON_SCALAR_REG = re.compile(r"[^\s,\]\}]+")
+_JSON_WS_REG = re.compile(r"\s*")
+_JSON_NESTED_REG = re.compile(r'"(?:[^"\\]|\\.)*"|[\[\]{}]', flags=re.DOTALL)
+
+
+def _split_toml_key(key: str) -> tuple[str, ...]:
+    return tuple(_part.strip("\"'") for _part in _TOML_KEY_PARTS_REG.findall(key))
+
+
+def _get_toml_depth(line: str, depth: int, pos: int = 0) -> int:
+    """
+    Return the nesting depth of arrays and inline tables at the end of the line, given the depth at pos.
+    Lines read while the depth is not 0 are values (for instance the items of a multi-line array),
+    never table headers nor keys.
+    """
+    for token in _TOML_BRACKET_REG.finditer(line, pos):
+        match token.group():
+            case "[" | "{":
+                depth += 1
+            case "]" | "}":
+                depth -= 1
+            case "#":
+                break
+    return max(depth, 0)
+
+
+def find_toml_values(text: str, keys: tuple[str, ...]) -> dict[str, list[Span]]:
+    """
+    Find the spans of the values of the given keys in a TOML document.
+    A dotted key (for instance "tool.poetry.version") is resolved against the current table
+    and only its first occurrence is returned: the scan stops as soon as every dotted key has been found.
+    A bare key (for instance "version") matches the key in any table, like the historical behavior.
+    The spans include the quotes of string values.
+    """
+    _paths = {_split_toml_key(key): key for key in keys if "." in key}
+    _bare_keys = {key for key in keys if "." not in key}
+    found: dict[str, list[Span]] = {key: [] for key in keys}
+    _remaining = len(_paths)
+
+    table: tuple[str, ...] = ()
+    in_multiline: str | None = None
+    depth = 0
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        _line_offset, offset = offset, offset + len(line)
+        if in_multiline is not None:
+            if in_multiline in line:
+                in_multiline = None
+            continue
+        if depth:
+            depth = _get_toml_depth(line, depth)
+            continue
+        if header := _TOML_HEADER_REG.match(line):
+            table = _split_toml_key(header["key"])
+            continue
+        if not (value := _TOML_VALUE_REG.match(line)):
+            if _assignment := _TOML_ASSIGNMENT_REG.match(line):
+                depth = _get_toml_depth(line, 0, _assignment.end())
+            continue
+        if _multiline := _TOML_MULTILINE_REG.match(line, value.start("value")):
+            if line.count(_multiline.group()) % 2:
+                in_multiline = _multiline.group()
+            continue
+        _key = value["key"]
+        _span = (_line_offset + value.start("value"), _line_offset + value.end("value"))
+        if _key in _bare_keys:
+            found[_key].append(_span)
+        if _paths and (_path_key := _paths.get(table + _split_toml_key(_key))) is not None and not found[_path_key]:
+            found[_path_key].append(_span)
+            _remaining -= 1
+            if not _remaining and not _bare_keys:
+                break
+    return found
+
+
+def find_toml_tables(text: str, table: str) -> list[Span] | None:
+    """
+    Find the spans of the given table (for instance "tool.track-bump") and of its sub-tables in a TOML document,
+    each span starting at the table header and ending before the next header.
+    Returns None if the table is (also) defined outside of its own headers, with dotted keys or an inline table.
+    """
+    _table = _split_toml_key(table)
+    spans: list[Span] = []
+    current: tuple[str, ...] = ()
+    start: int | None = None
+    in_multiline: str | None = None
+    depth = 0
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        _line_offset, offset = offset, offset + len(line)
+        if in_multiline is not None:
+            if in_multiline in line:
+                in_multiline = None
+            continue
+        if depth:
+            depth = _get_toml_depth(line, depth)
+            continue
+        if header := _TOML_HEADER_REG.match(line):
+            if start is not None:
+                spans.append((start, _line_offset))
+            current = _split_toml_key(header["key"])
+            start = _line_offset if current[: len(_table)] == _table else None
+            continue
+        if _assignment := _TOML_ASSIGNMENT_REG.match(line):
+            _key = current + _split_toml_key(_assignment["key"])
+            if start is None and _key[: len(_table)] == _table[: len(_key)]:
+                return None
+            depth = _get_toml_depth(line, 0, _assignment.end())
+        if (_multiline := _TOML_MULTILINE_REG.search(line)) and line.count(_multiline.group()) % 2:
+            in_multiline = _multiline.group()
+    if start is not None:
+        spans.append((start, len(text)))
+    return spans
+
+
+class _ScanDone(Exception):
+    pass
+
+
+class _JsonScanner:
+    def __init__(self, text: str, keys: tuple[str, ...]):
+        self.text = text
+        self.paths = {tuple(key.split(".")): key for key in keys}
+        self.prefixes = {_path[:i] for _path in self.paths for i in range(len(_path))}
+        self.found: dict[str, list[Span]] = {key: [] for key in keys}
+        self.remaining = len(self.paths)
+
+    def scan(self) -> dict[str, list[Span]]:
+        try:
+            self._value(self._ws(0), ())
+        except _ScanDone:
+            pass
+        return self.found
+
+    def _ws(self, pos: int) -> int:
+        return _JSON_WS_REG.match(self.text, pos).end()  # pyright: ignore[reportOptionalMemberAccess]
+
+    def _error(self, pos: int) -> ValueError:
+        return ValueError(f"Invalid JSON document at position {pos}")
+
+    def _value(self, pos: int, path: tuple[str, ...]) -> int:
+        if self.text.startswith("{", pos) and path in self.prefixes:
+            return self._object(pos, path)
+        return self._skip(pos)
+
+    def _object(self, pos: int, path: tuple[str, ...]) -> int:
+        pos = self._ws(pos + 1)
+        if self.text.startswith("}", pos):
+            return pos + 1
+        while True:
+            if not (_key := _JSON_STRING_REG.match(self.text, pos)):
+                raise self._error(pos)
+            pos = self._ws(_key.end())
+            if not self.text.startswith(":", pos):
+                raise self._error(pos)
+            pos = self._ws(pos + 1)
+            _path = path + (json.loads(_key.group()),)
+            _target = self.paths.get(_path)
+            if _target is not None and not self.found[_target]:
+                end = self._skip(pos)
+                self.found[_target].append((pos, end))
+                self.remaining -= 1
+                if not self.remaining:
+                    raise _ScanDone
+            else:
+                end = self._value(pos, _path)
+            pos = self._ws(end)
+            if self.text.startswith(",", pos):
+                pos = self._ws(pos + 1)
+            elif self.text.startswith("}", pos):
+                return pos + 1
+            else:
+                raise self._error(pos)
+
+    def _skip(self, pos: int) -> int:
+        """Return the end position of the value starting at pos, without decoding it"""
+        if self.text.startswith('"', pos):
+            if not (_string := _JSON_STRING_REG.match(self.text, pos)):
+                raise self._error(pos)
+            return _string.end()
+        if not self.text.startswith(("{", "["), pos):
+            if not (_scalar := _JSON_SCALAR_REG.match(self.text, pos)):
+                raise self._error(pos)
+            return _scalar.end()
+        depth = 0
+        for token in _JSON_NESTED_REG.finditer(self.text, pos):
+            match token.group():
+                case "{" | "[":
+                    depth += 1
+                case "}" | "]":
+                    depth -= 1
+                    if not depth:
+                        return token.end()
+        raise self._error(pos)
+
+
+def find_json_values(text: str, keys: tuple[str, ...]) -> dict[str, list[Span]]:
+    """
+    Find the span of the values of the given dotted keys (for instance "version" or "track-bump.version")
+    in a JSON document. Keys are resolved from the root object, nested objects that cannot contain
+    any of the keys are skipped without being decoded and the scan stops once every key has been found.
+    """
+    return _JsonScanner(text, keys).scan()
+
+
+def find_values(text: str, suffix: str, keys: tuple[str, ...]) -> dict[str, list[Span]]:
+    match suffix:
+        case ".toml":
+            return find_toml_values(text, keys)
+        case ".json":
+            return find_json_values(text, keys)
+        case _:
+            raise ValueError("Only .toml and .json files are supported")
+
+
+def read_value(text: str, span: Span, suffix: str) -> str:
+    """
+    Return the value found at the given span
+    """
+    _token = text[span[0] : span[1]]
+    if suffix == ".json":
+        _value = json.loads(_token)
+    elif _token.startswith("'"):
+        _value = _token[1:-1]
+    elif _token.startswith('"'):
+        _value = json.loads(_token)
+    else:
+        _value = _token
+    return str(_value)
+
+
+def replace_values(text: str, spans: list[Span], value: str) -> str:
+    """
+    Replace the values at the given spans with the new (string) value, leaving the rest of the text untouched
+    """
+    _parts = []
+    _pos = 0
+    for start, end in sorted(set(spans)):
+        _quote = "'" if text.startswith("'", start) else '"'
+        _parts += [text[_pos:start], f"{_quote}{value}{_quote}"]
+        _pos = end
+    _parts.append(text[_pos:])
+    return "".join(_parts)
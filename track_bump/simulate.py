@@ -0,0 +1,179 @@
+import itertools
+import json
+import random
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Literal, get_args
+
+from .tags import DEFAULT_TAG_PREFIX, get_base_stable_tag, get_branch_release, get_new_tag
+from .utils import parse_version
+
+__all__ = (
+    "SimulationEvent",
+    "SimulationResult",
+    "simulate",
+    "generate_events",
+    "load_events",
+)
+
+type VersionKey = tuple[int, int, int, int]
+type EventType = Literal["bump", "merge"]
+
+
+@dataclass(slots=True)
+class SimulationEvent:
+    # "bump": a commit on the branch followed by a bump, "merge": merge of source into branch
+    type: EventType
+    branch: str
+    source: str | None = None
+    message: str | None = None
+
+
+@dataclass(slots=True)
+class TimelineEntry:
+    event: int
+    branch: str
+    tag: str
+
+
+@dataclass
+class SimulationResult:
+    timeline: list[TimelineEntry] = field(default_factory=list)
+    # Tags computed more than once (the bump would fail since the tag already exists)
+    conflicts: list[TimelineEntry] = field(default_factory=list)
+    # Latest tag reachable from each branch
+    branches: dict[str, str | None] = field(default_factory=dict)
+    events: int = 0
+
+
+@dataclass(slots=True)
+class _BranchState:
+    # Latest stable and release tags reachable from the branch, with their sort keys
+    stable: tuple[VersionKey, str] | None = None
+    releases: dict[str, tuple[VersionKey, str]] = field(default_factory=dict)
+    last_tag: str | None = None
+
+    def copy(self) -> "_BranchState":
+        return _BranchState(stable=self.stable, releases=dict(self.releases), last_tag=self.last_tag)
+
+    def merge(self, other: "_BranchState"):
+        if other.stable is not None and (self.stable is None or other.stable[0] > self.stable[0]):
+            self.stable = other.stable
+        for _release, _tag in other.releases.items():
+            _current = self.releases.get(_release)
+            if _current is None or _tag[0] > _current[0]:
+                self.releases[_release] = _tag
+
+
+def simulate(
+    events: Iterable[SimulationEvent],
+    releases: dict[str, str],
+    version: str = "0.1.0",
+    prefix: str = DEFAULT_TAG_PREFIX,
+    keep_timeline: bool = True,
+) -> SimulationResult:
+    """
+    Replay the events in memory through the same rules as a real bump (`get_branch_release` and `get_new_tag`),
+    without git. Each branch only keeps the latest stable and release tags reachable from it: a merge makes
+    the tags of the source reachable from the branch, like in the repository.
+    The version is used as the current version when there is no stable tag yet, like `bump_project`.
+    """
+    _initial_stable_tag = get_base_stable_tag(version, prefix=prefix)
+
+    result = SimulationResult()
+    _branches: dict[str, _BranchState] = {}
+    _branch_releases: dict[str, str] = {}
+    _tags: set[str] = set()
+    _index = -1
+    for _index, _event in enumerate(events):
+        if _event.type == "merge":
+            if _event.source is None:
+                raise ValueError(f"Event {_index}: merge without source")
+            _source = _branches.setdefault(_event.source, _BranchState())
+            if _event.branch in _branches:
+                _branches[_event.branch].merge(_source)
+            else:
+                _branches[_event.branch] = _source.copy()
+            continue
+
+        _state = _branches.setdefault(_event.branch, _BranchState())
+        _release = _branch_releases.get(_event.branch)
+        if _release is None:
+            _release = _branch_releases[_event.branch] = get_branch_release(_event.branch, releases=releases)
+        _release_tag = _state.releases.get(_release)
+        _new_tag = get_new_tag(
+            stable_tag=_state.stable[1] if _state.stable is not None else _initial_stable_tag,
+            release_tag=_release_tag[1] if _release_tag is not None else None,
+            release=_release,
+            last_commit_message=_event.message,
+            prefix=prefix,
+        )
+        (major, minor, patch), _new_release = parse_version(_new_tag, prefix=prefix)
+        if _new_release is None:
+            _state.stable = ((major, minor, patch, 0), _new_tag)
+        else:
+            _state.releases[_release] = ((major, minor, patch, _new_release[1]), _new_tag)
+        _state.last_tag = _new_tag
+
+        _entry = TimelineEntry(event=_index, branch=_event.branch, tag=_new_tag)
+        if _new_tag in _tags:
+            result.conflicts.append(_entry)
+        _tags.add(_new_tag)
+        if keep_timeline:
+            result.timeline.append(_entry)
+
+    result.events = _index + 1
+    result.branches = {_branch: _state.last_tag for _branch, _state in _branches.items()}
+    return result
+
+
+def generate_events(count: int, default_branch: str, seed: int | None = None) -> Iterator[SimulationEvent]:
+    """
+    Generate a random but realistic history: features and bumps on develop, release branches created
+    from develop, fixes on the release branches and on the default branch, releases merged into
+    the default branch and the default branch merged back into develop.
+    """
+    _random = random.Random(seed)
+    _release_number = 0
+    _release_branch: str | None = None
+    _choices = ["develop", "release", "fix", "new-release", "release-merge", "back-merge"]
+    _cum_weights = list(itertools.accumulate([50, 15, 10, 5, 5, 15]))
+    for _ in range(count):
+        match _random.choices(_choices, cum_weights=_cum_weights)[0]:
+            case "release" if _release_branch is not None:
+                yield SimulationEvent(type="bump", branch=_release_branch, message="fix: release fix")
+            case "fix":
+                yield SimulationEvent(type="bump", branch=default_branch, message="fix: hot fix")
+            case "new-release" if _release_branch is None:
+                _release_number += 1
+                _release_branch = f"release/{_release_number}"
+                yield SimulationEvent(type="merge", branch=_release_branch, source="develop")
+            case "release-merge" if _release_branch is not None:
+                yield SimulationEvent(type="merge", branch=default_branch, source=_release_branch)
+                yield SimulationEvent(type="bump", branch=default_branch, message=f"release: {_release_branch}")
+                _release_branch = None
+            case "back-merge":
+                yield SimulationEvent(type="merge", branch="develop", source=default_branch)
+            case _:
+                yield SimulationEvent(type="bump", branch="develop", message="feat: feature")
+
+
+def load_events(path: Path) -> Iterator[SimulationEvent]:
+    """
+    Load the events from a JSON lines file, one event per line, for instance:
+        {"type": "bump", "branch": "develop", "message": "feat: foo"}
+        {"type": "merge", "source": "develop", "branch": "release/1"}
+    An event of an unknown type raises a ValueError, instead of being replayed as a bump.
+    """
+    _types = get_args(EventType.__value__)
+    with path.open() as f:
+        for _number, _line in enumerate(f, start=1):
+            if not _line.strip():
+                continue
+            _event = SimulationEvent(**json.loads(_line))
+            if _event.type not in _types:
+                raise ValueError(
+                    f"Line {_number}: unknown event type {_event.type!r} (expected one of: {', '.join(_types)})"
+                )
+            yield _event
@@ -1,32 +1,58 @@
 import re
+from typing import Literal
 
 from .logs import COMMIT_END, COMMIT_START, logger
-from .utils import get_last_tag, parse_version
+from .utils import TagIndex, get_dev_version_base, get_last_tag, parse_version
 
 __all__ = (
     "get_latest_stable_tag",
     "get_latest_release_tag",
     "get_branch_release",
     "get_new_tag",
+    "get_base_stable_tag",
+    "get_superseded_tags",
+    "get_dev_version",
+    "get_dev_version_base",
+    "DEFAULT_TAG_PREFIX",
+    "count_tags_per_release",
+    "get_tag_ranges",
 )
 
+DEFAULT_TAG_PREFIX = "v"
 
-def get_latest_stable_tag():
+
+def _get_stable_tag_pattern(prefix: str) -> str:
+    return rf"^{re.escape(prefix)}\d+\.\d+\.\d+$"
+
+
+def _get_release_tag_pattern(prefix: str, release: str) -> str:
+    return rf"^{re.escape(prefix)}\d+\.\d+\.\d+-{release}\.\d+$"
+
+
+def get_latest_stable_tag(
+    ref: str | None = None, index: TagIndex | None = None, prefix: str = DEFAULT_TAG_PREFIX
+) -> str | None:
     f"""
     Get the latest tag of the DEFAULT_BRANCH branch (stable)
     For example:
      - if the DEFAULT_BRANCH has a tag v0.1.0, it will return v0.1.0
+    If ref is specified, only the tags reachable from it are considered.
+    Only the tags starting with the prefix are read (for instance pkg-a/v0.1.0 with the prefix pkg-a/v).
     """
-    return get_last_tag(r"^v\d+\.\d+\.\d+$")
+    return get_last_tag(_get_stable_tag_pattern(prefix), ref=ref, index=index, prefix=prefix)
 
 
-def get_latest_release_tag(release_tag: str) -> str | None:
+def get_latest_release_tag(
+    release_tag: str, ref: str | None = None, index: TagIndex | None = None, prefix: str = DEFAULT_TAG_PREFIX
+) -> str | None:
     """
     Get the latest tag of the given release_tag
     For example:
         - if the release_tag is "beta", it will return the latest tag v0.1.0-beta.1
+    If ref is specified, only the tags reachable from it are considered.
+    Only the tags starting with the prefix are read.
     """
-    return get_last_tag(rf"^v\d+\.\d+\.\d+-{release_tag}\.\d+$")
+    return get_last_tag(_get_release_tag_pattern(prefix, release_tag), ref=ref, index=index, prefix=prefix)
 
 
 def get_branch_release(branch: str, releases: dict[str, str]) -> str:
@@ -45,11 +71,21 @@ def get_branch_release(branch: str, releases: dict[str, str]) -> str:
 _BUMP_MINOR_REG = re.compile(r"release:.*")
 
 
+def get_base_stable_tag(version: str, prefix: str = DEFAULT_TAG_PREFIX) -> str:
+    """
+    Return the stable tag the new tags are computed from when there is no stable tag yet,
+    derived from the current version (for instance 0.2.0 -> v0.1.0)
+    """
+    (major, minor, patch), _ = parse_version(version)
+    return f"{prefix}{major}.{max(minor - 1, 1)}.{patch}"
+
+
 def get_new_tag(
     stable_tag: str,
     release_tag: str | None,
     release: str,
     last_commit_message: str | None = None,
+    prefix: str = DEFAULT_TAG_PREFIX,
 ) -> str:
     """
     Return the new tag based on the latest release tag and current branch
@@ -60,9 +96,10 @@ def get_new_tag(
     - if branch is stable and the latest stable tag is v0.1.0:
         - if the last commit message is "release: .*": v0.2.0
         - else: v0.1.1
+    The tags start with the given prefix (v by default).
     """
-    (major, minor, patch), _ = parse_version(stable_tag)
-    _next_release = f"v{major}.{minor + 1}.0"
+    (major, minor, patch), _ = parse_version(stable_tag, prefix=prefix)
+    _next_release = f"{prefix}{major}.{minor + 1}.0"
     # We are releasing a new version
     if release == "stable":
         logger.info(
@@ -75,10 +112,10 @@ def get_new_tag(
             _tag = _next_release
         else:
             logger.debug("Bumping patch")
-            _tag = f"v{major}.{minor}.{patch + 1}"
+            _tag = f"{prefix}{major}.{minor}.{patch + 1}"
     else:
         if release_tag is not None:
-            (_release_major, _release_minor, _release_patch), _tag_part = parse_version(release_tag)
+            (_release_major, _release_minor, _release_patch), _tag_part = parse_version(release_tag, prefix=prefix)
             if _tag_part is None:
                 raise ValueError(f"Invalid tag: {release_tag!r}")
             (_tag, _tag_version) = _tag_part
@@ -91,3 +128,127 @@ def get_new_tag(
         _tag = f"{_next_release}-{release}.{_release_number}"
 
     return _tag
+
+
+def get_superseded_tags(tags: list[str], keep_last: int = 0, prefix: str = DEFAULT_TAG_PREFIX) -> list[str]:
+    """
+    Return the pre-release tags that are superseded by a stable tag, keeping the `keep_last`
+    most recent ones of each release (beta, rc, ...)
+    For example, with the tags v0.1.0, v0.2.0, v0.2.0-beta.0, v0.2.0-beta.1, v0.3.0-beta.0:
+        - keep_last=0: v0.2.0-beta.1, v0.2.0-beta.0
+        - keep_last=1: v0.2.0-beta.0
+    v0.3.0-beta.0 is not superseded since there is no stable tag v0.3.0 or above
+    Only the tags starting with the prefix are considered.
+    """
+    _stable_tag_reg = re.compile(_get_stable_tag_pattern(prefix))
+    _release_tag_reg = re.compile(_get_release_tag_pattern(prefix, r"\w+"))
+    _stable_versions = [parse_version(_tag, prefix=prefix)[0] for _tag in tags if _stable_tag_reg.match(_tag)]
+    if not _stable_versions:
+        return []
+    _latest_stable = max(_stable_versions)
+
+    _superseded: dict[str, list[tuple[tuple[int, int, int, int], str]]] = {}
+    for _tag in tags:
+        if not _release_tag_reg.match(_tag):
+            continue
+        _version, _release = parse_version(_tag, prefix=prefix)
+        if _release is None or _version > _latest_stable:
+            continue
+        _release_name, _release_number = _release
+        _superseded.setdefault(_release_name, []).append(((*_version, _release_number), _tag))
+
+    _tags = []
+    for _release_tags in _superseded.values():
+        _release_tags.sort(reverse=True)
+        _tags += [_tag for _, _tag in _release_tags[keep_last:]]
+    return _tags
+
+
+# PEP 440 pre-release segments of the release names
+_PEP440_PRE_RELEASES = {
+    "alpha": "a",
+    "a": "a",
+    "beta": "b",
+    "b": "b",
+    "rc": "rc",
+    "c": "rc",
+    "pre": "rc",
+    "preview": "rc",
+}
+
+
+def get_dev_version(
+    tag: str,
+    distance: int,
+    commit: str,
+    style: Literal["semver", "pep440"] = "semver",
+    prefix: str = DEFAULT_TAG_PREFIX,
+) -> str:
+    """
+    Return a unique and sortable development version from the closest tag and the number of commits since it
+    For example, with 5 commits since the tag and the commit 1a2b3c4:
+        - semver: v0.1.0 -> 0.1.1-dev.5+g1a2b3c4, v0.2.0-beta.1 -> 0.2.0-beta.1.5+g1a2b3c4
+        - pep440: v0.1.0 -> 0.1.1.dev5, v0.2.0-beta.1 -> 0.2.0b2.dev5 (after 0.2.0b1, before 0.2.0b2)
+    """
+    (major, minor, patch), release = parse_version(tag, prefix=prefix)
+    if release is None:
+        patch += 1
+    match style:
+        case "pep440":
+            if release is None:
+                return f"{major}.{minor}.{patch}.dev{distance}"
+            if (_pre_release := _PEP440_PRE_RELEASES.get(release[0])) is None:
+                raise ValueError(f"Release {release[0]!r} cannot be expressed as a PEP 440 pre-release")
+            return f"{major}.{minor}.{patch}{_pre_release}{release[1] + 1}.dev{distance}"
+        case "semver":
+            _pre_release = "dev" if release is None else f"{release[0]}.{release[1]}"
+            return f"{major}.{minor}.{patch}-{_pre_release}.{distance}+g{commit}"
+        case _:
+            raise ValueError(f"Unsupported version style: {style!r}")
+
+
+def count_tags_per_release(tags: list[str], prefix: str = DEFAULT_TAG_PREFIX) -> dict[str, int]:
+    """
+    Count the tags per release ("stable", "beta", "rc", ...), tags not matching the patterns are counted as "other"
+    """
+    _stable_tag_reg = re.compile(_get_stable_tag_pattern(prefix))
+    _release_tag_reg = re.compile(_get_release_tag_pattern(prefix, r"(?P<release>\w+)"))
+    _counts: dict[str, int] = {}
+    for _tag in tags:
+        if _stable_tag_reg.match(_tag):
+            _release = "stable"
+        elif _match := _release_tag_reg.match(_tag):
+            _release = _match["release"]
+        else:
+            _release = "other"
+        _counts[_release] = _counts.get(_release, 0) + 1
+    return _counts
+
+
+def get_tag_ranges(
+    tags: list[str], release: str = "stable", prefix: str = DEFAULT_TAG_PREFIX
+) -> list[tuple[str | None, str]]:
+    """
+    Return the (previous tag, tag) pairs of the tags of the given release, most recent first.
+    The previous tag of a stable tag is the previous stable tag, the previous tag of a pre-release tag
+    is the previous tag of the same release or stable tag, whichever is the most recent. For example:
+        - stable: (v0.2.0, v0.3.0), (v0.1.0, v0.2.0), (None, v0.1.0)
+        - rc: (v0.2.0-rc.0, v0.2.0-rc.1), (v0.1.0, v0.2.0-rc.0)
+    """
+    _stable_tag_reg = re.compile(_get_stable_tag_pattern(prefix))
+    _release_tag_reg = re.compile(_get_release_tag_pattern(prefix, re.escape(release)))
+    _tags: list[tuple[tuple[int, int, int, int, int], str]] = []
+    for _tag in tags:
+        if _stable_tag_reg.match(_tag):
+            # A stable version comes after its pre-releases
+            _tags.append(((*parse_version(_tag, prefix=prefix)[0], 1, 0), _tag))
+        elif release != "stable" and _release_tag_reg.match(_tag):
+            _version, _release = parse_version(_tag, prefix=prefix)
+            _tags.append(((*_version, 0, _release[1] if _release else 0), _tag))
+    _tags.sort()
+
+    ranges = []
+    for i, (_key, _tag) in enumerate(_tags):
+        if release == "stable" or _key[3] == 0:
+            ranges.append((_tags[i - 1][1] if i > 0 else None, _tag))
+    return ranges[::-1]
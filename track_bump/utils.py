@@ -1,8 +1,12 @@
 import contextlib
+import functools
+import itertools
 import os
 import pathlib
 import re
 import subprocess
+from collections.abc import Iterator
+from dataclasses import dataclass, field
 
 from track_bump.env import CI_USER, CI_USER_EMAIL
 
@@ -11,16 +15,41 @@ from .logs import logger
 __all__ = (
     "exec_cmd",
     "get_last_tag",
+    "resolve_branch",
     "git_tag",
     "git_setup",
     "set_cd",
     "get_current_branch",
     "git_commit",
     "parse_version",
+    "get_dev_version_base",
     "get_tags",
+    "TagIndex",
+    "get_branches",
+    "get_head_commit",
     "get_last_commit_message",
     "fetch_tags",
     "get_default_branch",
+    "delete_tags",
+    "git_push",
+    "reserve_tag",
+    "git_reset",
+    "git_restore",
+    "tag_exists",
+    "is_ancestor",
+    "git_pull_rebase",
+    "git_describe",
+    "get_commit_count",
+    "get_ref_storage",
+    "count_tag_refs",
+    "pack_refs",
+    "delete_remote_tags",
+    "get_remote_tags",
+    "get_toplevel",
+    "get_git_paths",
+    "list_tracked_files",
+    "stream_cmd",
+    "get_tags_commits",
 )
 
 
@@ -46,6 +75,32 @@ def exec_cmd(
     return stdout
 
 
+def stream_cmd(cmd: str, separator: str = "\n", chunk_size: int = 65536) -> Iterator[str]:
+    """
+    Execute the command and yield its output record by record (split on separator) as it is produced,
+    without buffering the whole output
+    """
+    default_shell = os.getenv("SHELL", "/bin/bash")
+    logger.debug(f"Streaming command {cmd!r}")
+    process = subprocess.Popen(
+        cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, executable=default_shell, text=True
+    )
+    assert process.stdout is not None
+    try:
+        _rest = ""
+        while _chunk := process.stdout.read(chunk_size):
+            *_records, _rest = (_rest + _chunk).split(separator)
+            yield from _records
+        if _rest:
+            yield _rest
+    finally:
+        process.stdout.close()
+        _stderr = process.stderr.read() if process.stderr else ""
+        exit_code = process.wait()
+    if exit_code != 0:
+        raise OSError(_stderr)
+
+
 @contextlib.contextmanager
 def set_cd(path: pathlib.Path):
     prev_cwd = pathlib.Path.cwd()
@@ -61,19 +116,258 @@ def fetch_tags(force: bool = False):
     exec_cmd("git fetch --tags" + (" --force" if force else ""))
 
 
-def get_tags():
-    tags = exec_cmd("git tag --sort=-version:refname").split("\n")
+def get_tags(prefix: str | None = None):
+    """
+    Return the tags sorted by version (most recent first).
+    If a prefix is given, only the refs under refs/tags/<prefix> are read
+    """
+    _pattern = f"'refs/tags/{prefix}*'" if prefix else "refs/tags"
+    tags = exec_cmd(f"git for-each-ref --sort=-version:refname --format='%(refname:lstrip=2)' {_pattern}").split("\n")
     return [x.strip() for x in tags if x.strip()]
 
 
-def get_last_tag(pattern: str) -> str | None:
-    _tags = get_tags()
-    _valid_tags = [_tag for _tag in _tags if re.match(pattern, _tag)]
+def get_tags_commits(prefix: str | None = None) -> dict[str, tuple[str, str]]:
+    """
+    Return the commit each tag points to and the date of the tag (YYYY-MM-DD), with a single `git for-each-ref` call.
+    Annotated tags are peeled to their commit.
+    """
+    _pattern = f"'refs/tags/{prefix}*'" if prefix else "refs/tags"
+    _output = exec_cmd(
+        "git for-each-ref --format='%(refname:lstrip=2)%09%(objectname)%09%(*objectname)%09%(creatordate:short)' "
+        + _pattern
+    )
+    tags = {}
+    for _line in _output.splitlines():
+        if not _line.strip():
+            continue
+        _tag, _object, _peeled, _date = _line.split("\t")
+        tags[_tag] = (_peeled or _object, _date)
+    return tags
+
+
+@dataclass
+class TagIndex:
+    """
+    Index of the tags of the repository, read once and shared by all the queries:
+        - the commit each tag points to (single `git for-each-ref`)
+        - the graph of the decorated commits (tagged commits, branches, HEAD), with a single
+          `git rev-list --all --simplify-by-decoration --parents`
+    The most recent tag matching a pattern and reachable from a commit is then computed in Python,
+    propagating the tags along the graph and caching the result per commit, so querying several branches
+    costs one history walk in total.
+    """
+
+    # Only the tags starting with the prefix are indexed
+    prefix: str = ""
+    # Tags sorted by version (most recent first) and the commit each one points to
+    tags: list[str] = field(default_factory=list)
+    commits: dict[str, str] = field(default_factory=dict)
+    _loaded: bool = False
+    # Decorated commit -> parent decorated commits
+    _parents: dict[str, list[str]] = field(default_factory=dict)
+    # Commit -> positions of its tags in self.tags
+    _commit_tags: dict[str, list[int]] = field(default_factory=dict)
+    # Pattern -> commit -> position of the most recent tag matching the pattern reachable from the commit
+    _latest: dict[str, dict[str, int | None]] = field(default_factory=dict)
+
+    def _load(self):
+        if self._loaded:
+            return
+        _output = exec_cmd(
+            "git for-each-ref --sort=-version:refname "
+            f"--format='%(refname) %(objectname) %(*objectname)' 'refs/tags/{self.prefix}*'"
+        )
+        for _line in _output.split("\n"):
+            if not _line.strip():
+                continue
+            _ref, _object, *_peeled = _line.split()
+            _tag = _ref.removeprefix("refs/tags/")
+            self.commits[_tag] = _peeled[0] if _peeled else _object
+            self._commit_tags.setdefault(self.commits[_tag], []).append(len(self.tags))
+            self.tags.append(_tag)
+        _graph = exec_cmd("git rev-list --all --simplify-by-decoration --parents", ignore_errors=True)
+        for _line in _graph.split("\n"):
+            if _line.strip():
+                _commit, *_parents = _line.split()
+                self._parents[_commit] = _parents
+        self._loaded = True
+
+    def resolve(self, ref: str) -> str | None:
+        """
+        Return the commit the ref points to, or None if it cannot be resolved (unknown branch, no commits yet...)
+        """
+        if ref in self._parents:
+            return ref
+        return exec_cmd(f"git rev-parse --verify --quiet {ref}^{{commit}}", ignore_errors=True).strip() or None
+
+    def get_latest_tag(self, pattern: str, ref: str) -> str | None:
+        """
+        Return the most recent tag matching the pattern reachable from the ref
+        Raises a ValueError if the ref cannot be resolved (except HEAD in a repository without commits)
+        """
+        self._load()
+        _commit = self.resolve(ref)
+        if _commit is None:
+            if ref == "HEAD":
+                return None
+            raise ValueError(f"Could not resolve {ref!r}")
+        if _commit not in self._parents:
+            # Not a decorated commit (for instance HEAD~1): its decorated ancestors are read from git
+            _graph = {}
+            for _line in exec_cmd(f"git rev-list --simplify-by-decoration --parents {_commit}").split("\n"):
+                if _line.strip():
+                    _node, *_parents = _line.split()
+                    _graph[_node] = _parents
+            _children = {_parent for _parents in _graph.values() for _parent in _parents}
+            self._parents.update(_graph)
+            if _commit not in _graph:
+                # The closest decorated ancestors are the ones that are not the parent of another one
+                self._parents[_commit] = [_node for _node in _graph if _node not in _children]
+        _position = self._get_latest_position(pattern, _commit)
+        return self.tags[_position] if _position is not None else None
+
+    def _get_latest_position(self, pattern: str, commit: str) -> int | None:
+        _reg = re.compile(pattern)
+        _latest = self._latest.setdefault(pattern, {})
+        # Iterative post-order walk: the parents are resolved before their children
+        _stack = [commit]
+        while _stack:
+            _node = _stack[-1]
+            if _node in _latest:
+                _stack.pop()
+                continue
+            _parents = self._parents.get(_node, [])
+            if _pending := [_parent for _parent in _parents if _parent not in _latest]:
+                _stack += _pending
+                continue
+            _stack.pop()
+            _positions = [_pos for _pos in self._commit_tags.get(_node, []) if _reg.match(self.tags[_pos])]
+            _positions += [_pos for _parent in _parents if (_pos := _latest[_parent]) is not None]
+            _latest[_node] = min(_positions, default=None)
+        return _latest[commit]
+
+
+def get_last_tag(pattern: str, ref: str | None = None, index: TagIndex | None = None, prefix: str = "") -> str | None:
+    """
+    Return the most recent tag matching the pattern.
+    If a ref is given, only the tags reachable from it are considered (see `TagIndex`),
+    a ValueError is raised if it cannot be resolved.
+    If a prefix is given, only the tags starting with it are read.
+    """
+    if ref is not None:
+        return (index or TagIndex(prefix=prefix)).get_latest_tag(pattern, ref)
+    _valid_tags = [_tag for _tag in get_tags(prefix) if re.match(pattern, _tag)]
     return _valid_tags[0] if _valid_tags else None
 
 
-def git_tag(version: str):
-    _output = exec_cmd(f"git tag {version}")
+def resolve_branch(branch: str, remote: str = "origin") -> str:
+    """
+    Return the ref of the branch: the local branch if it exists, the remote branch otherwise
+    """
+    for _ref in (f"refs/heads/{branch}", f"refs/remotes/{remote}/{branch}"):
+        if exec_cmd(f"git rev-parse --verify --quiet '{_ref}^{{commit}}'", ignore_errors=True).strip():
+            return _ref
+    raise ValueError(f"Branch {branch!r} not found locally nor on {remote}")
+
+
+def git_tag(version: str, commit: str | None = None):
+    _output = exec_cmd(f"git tag {version}" + (f" {commit}" if commit else ""))
+
+
+def git_push(remote: str, branch: str | None, tag: str | None = None):
+    """
+    Push the current commit to the given branch (if any) and the tag (if any) in a single atomic push:
+    either all the refs are updated on the remote or none of them.
+    Explicit refspecs are used so only the new refs are negotiated with the remote
+    """
+    _refspecs = [f"HEAD:refs/heads/{branch}"] if branch is not None else []
+    if tag is not None:
+        _refspecs.append(f"refs/tags/{tag}:refs/tags/{tag}")
+    exec_cmd(f"git push --atomic {remote} {' '.join(_refspecs)}")
+
+
+def reserve_tag(remote: str, tag: str, branch: str | None = None) -> bool:
+    """
+    Create the tag on the remote, only if it does not exist there yet (compare-and-swap on the tag ref).
+    If a branch is given, the current commit is pushed to it in the same atomic push.
+    Returns False if the tag has not been created by this push: already taken by another job
+    (even by an identical commit) or rejected branch update
+    """
+    _refspecs = [f"refs/tags/{tag}:refs/tags/{tag}"]
+    if branch is not None:
+        _refspecs.append(f"HEAD:refs/heads/{branch}")
+    _output = exec_cmd(
+        f"git push --porcelain --atomic --force-with-lease=refs/tags/{tag}: {remote} {' '.join(_refspecs)}",
+        ignore_errors=True,
+    )
+    # Porcelain lines are "<flag>\t<from>:<to>\t<summary>", "*" being a new ref
+    _statuses = {_line.split("\t")[1]: _line[0] for _line in _output.split("\n") if _line.count("\t") >= 2}
+    _status = _statuses.get(_refspecs[0])
+    if _status is None:
+        raise OSError(f"Could not push {tag} to {remote}: {_output}")
+    if _status != "*":
+        logger.debug(f"Tag {tag} not reserved: {_output}")
+    return _status == "*"
+
+
+def git_reset(commit: str):
+    """
+    Move the current branch back to the given commit, keeping the changes staged
+    """
+    exec_cmd(f"git reset --soft {commit}")
+
+
+def git_restore(commit: str, paths: list[str]):
+    """
+    Restore the given files (index and working tree) to their content at the given commit
+    """
+    if paths:
+        _paths = " ".join(f"'{_path}'" for _path in paths)
+        exec_cmd(f"git restore --source={commit} --staged --worktree -- {_paths}")
+
+
+def tag_exists(tag: str) -> bool:
+    return bool(exec_cmd(f"git rev-parse --verify --quiet 'refs/tags/{tag}'", ignore_errors=True).strip())
+
+
+def is_ancestor(commit: str, ref: str = "HEAD") -> bool:
+    """
+    Return whether the commit is reachable from the ref (the ref itself included)
+    """
+    return exec_cmd(f"git merge-base --is-ancestor {commit} {ref} && echo yes", ignore_errors=True).strip() == "yes"
+
+
+def git_pull_rebase(remote: str, branch: str):
+    exec_cmd(f"git pull --rebase --autostash {remote} {branch}")
+
+
+# Keeps the command lines well below the system ARG_MAX
+_BATCH_SIZE = 1000
+
+
+def get_remote_tags(remote: str, prefix: str = "") -> list[str]:
+    """
+    Return the tags of the remote (starting with the prefix, if any), without fetching them
+    """
+    _refs = exec_cmd(f"git ls-remote --tags --refs {remote}").split("\n")
+    _tags = [_ref.split("\t")[1].removeprefix("refs/tags/") for _ref in _refs if "\t" in _ref]
+    return [_tag for _tag in _tags if _tag.startswith(prefix)]
+
+
+def delete_tags(tags: list[str]):
+    """
+    Delete the given local tags, using one `git tag -d` per batch of tags
+    """
+    for _tags in itertools.batched(tags, _BATCH_SIZE):
+        exec_cmd(f"git tag -d {' '.join(_tags)}")
+
+
+def delete_remote_tags(tags: list[str], remote: str):
+    """
+    Delete the given tags on the remote, using one `git push --delete` per batch of tags
+    """
+    for _tags in itertools.batched(tags, _BATCH_SIZE):
+        exec_cmd(f"git push --delete {remote} {' '.join(f'refs/tags/{_tag}' for _tag in _tags)}")
 
 
 @contextlib.contextmanager
@@ -112,10 +406,127 @@ def git_setup(sign_commits: bool = False, default_branch: str | None = None, no_
                 logger.warning(f"Failed to run 'git config --unset {key}' ({e.args})")
 
 
+@dataclass
+class Branch:
+    # Short ref name, for instance develop or origin/develop
+    ref: str
+    # Name of the branch without the remote, for instance develop
+    name: str
+    commit: str
+    subject: str
+
+
+def get_branches() -> list[Branch]:
+    """
+    Return the local and remote branches (without symbolic refs such as origin/HEAD)
+    with a single `git for-each-ref` call
+    """
+    _output = exec_cmd(
+        "git for-each-ref --format='%(refname)%09%(objectname)%09%(symref)%09%(contents:subject)' "
+        "refs/heads refs/remotes"
+    )
+    _branches = []
+    for _line in _output.split("\n"):
+        if not _line.strip():
+            continue
+        _ref, _commit, _symref, _subject = _line.split("\t", 3)
+        if _symref:
+            continue
+        if _ref.startswith("refs/heads/"):
+            _short_ref = _name = _ref.removeprefix("refs/heads/")
+        else:
+            _short_ref = _ref.removeprefix("refs/remotes/")
+            _name = _short_ref.split("/", 1)[-1]
+        _branches.append(Branch(ref=_short_ref, name=_name, commit=_commit, subject=_subject))
+    return _branches
+
+
 def get_current_branch() -> str:
     return exec_cmd("git branch --show-current").strip()
 
 
+def git_describe(match: str = "v[0-9]*") -> tuple[str, int, str] | None:
+    """
+    Return the closest tag reachable from HEAD matching the glob, the number of commits since this tag
+    and the abbreviated commit, with a single `git describe` call (which uses the commit-graph when available).
+    For example: ("v0.2.0-beta.1", 5, "1a2b3c4")
+    Returns None if there is no such tag
+    """
+    _output = exec_cmd(f"git describe --tags --long --abbrev=7 --match '{match}'", ignore_errors=True).strip()
+    if not _output:
+        return None
+    _tag, _distance, _commit = _output.rsplit("-", 2)
+    return _tag, int(_distance), _commit.removeprefix("g")
+
+
+def get_commit_count(ref: str = "HEAD") -> int:
+    return int(exec_cmd(f"git rev-list --count {ref}").strip())
+
+
+def get_toplevel() -> pathlib.Path:
+    return pathlib.Path(exec_cmd("git rev-parse --show-toplevel").strip())
+
+
+def get_git_paths(*names: str) -> list[pathlib.Path]:
+    """
+    Return the absolute paths of the given files of the git directory (for instance "index"),
+    taking worktrees into account
+    """
+    _output = exec_cmd("git rev-parse " + " ".join(f"--git-path '{_name}'" for _name in names))
+    return [pathlib.Path(_path).absolute() for _path in _output.splitlines()]
+
+
+def list_tracked_files(*pathspecs: str) -> list[str]:
+    """
+    Return the files tracked by git matching the pathspecs (relative to the current directory),
+    so untracked and ignored directories are never walked
+    """
+    _pathspecs = " ".join(f"'{_pathspec}'" for _pathspec in pathspecs)
+    return [_file for _file in exec_cmd(f"git ls-files -z -- {_pathspecs}").split("\0") if _file]
+
+
+def get_ref_storage() -> str:
+    """
+    Return the ref storage backend of the repository: "files" (loose and packed refs) or "reftable"
+    """
+    return exec_cmd("git config extensions.refStorage", ignore_errors=True).strip() or "files"
+
+
+def count_tag_refs() -> tuple[int, int]:
+    """
+    Return the number of loose tag refs (one file per tag under refs/tags) and packed tag refs (packed-refs file)
+    """
+    _git_dir = pathlib.Path(exec_cmd("git rev-parse --git-common-dir").strip())
+    _loose = sum(len(_files) for _, _, _files in os.walk(_git_dir / "refs" / "tags"))
+    _packed_refs = _git_dir / "packed-refs"
+    _packed = 0
+    if _packed_refs.exists():
+        with _packed_refs.open() as f:
+            # Lines are "<object> <ref>", peeled lines start with "^" and the header with "#"
+            _packed = sum(1 for _line in f if _line[0] not in "#^" and " refs/tags/" in _line)
+    return _loose, _packed
+
+
+def pack_refs(threshold: int = 0) -> bool:
+    """
+    Move the loose tag refs to the packed-refs file if there are more than `threshold` of them.
+    Nothing is done with the reftable backend, which compacts its tables by itself.
+    Returns whether the refs have been packed
+    """
+    if get_ref_storage() != "files":
+        return False
+    _loose, _ = count_tag_refs()
+    if _loose <= threshold:
+        return False
+    logger.debug(f"Packing {_loose} loose tag refs")
+    exec_cmd("git pack-refs")
+    return True
+
+
+def get_head_commit() -> str:
+    return exec_cmd("git rev-parse HEAD").strip()
+
+
 def git_commit(message: str):
     exec_cmd("git add .")
     exec_cmd(f'git commit -m "{message}"')
@@ -129,24 +540,54 @@ def get_last_commit_message() -> str | None:
 type MajorMinorPatch = tuple[int, int, int]
 type ReleaseVersion = tuple[str, int]
 
+_VERSION_REG = re.compile(r"(\d+)\.(\d+)\.(\d+)(?:-(\w+)\.(\d+))?")
+# Development versions computed by `get_dev_version`
+_SEMVER_DEV_VERSION_REG = re.compile(r"(?P<version>\d+\.\d+\.\d+)-(?:dev|(?P<release>\w+\.\d+))\.\d+\+g\w+")
+_PEP440_DEV_VERSION_REG = re.compile(r"(?P<version>\d+\.\d+\.\d+)(?:(?P<pre>a|b|rc)(?P<number>\d+))?\.dev\d+")
+# Release names of the PEP 440 pre-release segments
+_PEP440_RELEASES = {"a": "alpha", "b": "beta", "rc": "rc"}
 
-def parse_version(version: str) -> tuple[MajorMinorPatch, ReleaseVersion | None]:
+
+def get_dev_version_base(version: str) -> str:
+    """
+    Return the version a development version has been computed from (see `get_dev_version`),
+    or the version itself if it is not a development version. For example:
+        - 0.1.1-dev.5+g1a2b3c4, 0.1.1.dev5 -> 0.1.0
+        - 0.2.0-beta.1.5+g1a2b3c4, 0.2.0b2.dev5 -> 0.2.0-beta.1
+    """
+    if _match := _SEMVER_DEV_VERSION_REG.fullmatch(version):
+        if _match["release"] is not None:
+            return f"{_match['version']}-{_match['release']}"
+    elif _match := _PEP440_DEV_VERSION_REG.fullmatch(version):
+        if _match["pre"] is not None:
+            return f"{_match['version']}-{_PEP440_RELEASES[_match['pre']]}.{int(_match['number']) - 1}"
+    else:
+        return version
+    major, minor, patch = _match["version"].split(".")
+    return f"{major}.{minor}.{max(int(patch) - 1, 0)}"
+
+
+# Tags are parsed over and over (tag scans, simulations), the cache avoids splitting the same tags again
+@functools.lru_cache(maxsize=4096)
+def parse_version(version: str, prefix: str = "v") -> tuple[MajorMinorPatch, ReleaseVersion | None]:
     """
     Parse the version string and return a tuple with the major, minor, patch and the release version if any
     For example:
     - v0.1.0-beta.1 -> ((0, 1, 0), ('beta', 1))
     - v0.1.0 -> ((0, 1, 0), None)
+    - pkg-a@0.1.0 (prefix: pkg-a@) -> ((0, 1, 0), None)
+    Development versions (see `get_dev_version`) are parsed as the version they have been computed from
+    (see `get_dev_version_base`):
+    - 0.2.0-beta.1.5+g1a2b3c4, 0.2.0b2.dev5 -> ((0, 2, 0), ('beta', 1))
+    - 0.1.1-dev.5+g1a2b3c4, 0.1.1.dev5 -> ((0, 1, 0), None)
+    Any other suffix (v1.2.3garbage, v1.2.3-beta...) is invalid.
     """
-
-    _version, *_release = version.removeprefix("v").split("-")
-    major, minor, patch = [int(x) for x in _version.split(".")]
-
-    if _release:
-        _release_name, _release_number_str = _release[0].split(".")
-        release = (_release_name, int(_release_number_str))
-    else:
-        release = None
-    return (major, minor, patch), release
+    _match = _VERSION_REG.fullmatch(get_dev_version_base(version.removeprefix(prefix)))
+    if _match is None:
+        raise ValueError(f"Invalid version: {version!r}")
+    major, minor, patch, _release_name, _release_number = _match.groups()
+    release = (_release_name, int(_release_number)) if _release_name is not None else None
+    return (int(major), int(minor), int(patch)), release
 
 
 def get_git_email(ignore_errors: bool = False):